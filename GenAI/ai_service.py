@@ -1,21 +1,51 @@
 import os
 import json
-import base64
-import numpy as np
-import pandas as pd
+import time
+import asyncio
+import re
+import uuid
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from typing import List, Dict, Any, Optional, Union, Annotated
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Body, Depends
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Body, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field, EmailStr
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-import uuid
-from io import BytesIO
 from google import genai
 from google.genai import types
+from embeddings import EmbeddingWorkerPool, QueryBatcher
+from course_store import CourseCatalog, load_course_store
+from vector_index import load_or_build_index, normalize_rows, top_k
+from candidate_index import CandidateIndex
+from resume_text import OCTET_MIME, TEXT_MIME, ExtractionStats, sniff_mime, timed_extract
+from resume_jobs import ResumeJobQueue, create_job_store
+from resume_bulk import ingest_resumes, iter_resume_files
+from chat_history import ChatHistoryManager
+from uploads import UploadLimitMiddleware, UploadTooLargeError, decode_base64, read_upload
+from skills import SkillMatcher, SkillTaxonomy, normalize_skill
+from caching import TTLCache, SingleFlight, create_response_cache, response_fingerprint
+from gemini_control import (
+    ENDPOINT_PRIORITIES, LatencyTracker, PriorityLimiter, RetryingCaller, RetryPolicy, UpstreamBusyError,
+    retry_policy_from_env
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bind right away; the model and catalog load in the background until /readyz passes
+    startup = asyncio.create_task(start_background_services())
+    resume_job_queue.start()
+    try:
+        yield
+    finally:
+        startup.cancel()
+        resume_job_queue.stop()
+        for task in background_tasks:
+            task.cancel()
+        embedding_pool.shutdown()
 
 # Initialize the application
-app = FastAPI(title="Career Accessibility Platform API")
+app = FastAPI(title="Career Accessibility Platform API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -31,26 +61,242 @@ GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 gemini_client = genai.Client(api_key=GEMINI_API_KEY)
 gemini_model = "gemini-2.0-flash"
 
-# Load courses data at startup
+# Optional response cache: "off", "memory", "sqlite:<path>" or "dir:<path>"
+gemini_response_cache = create_response_cache(
+    os.environ.get('GEMINI_CACHE', 'off'),
+    ttl=float(os.environ.get('GEMINI_CACHE_TTL', '86400')),
+    memory_size=int(os.environ.get('GEMINI_CACHE_MEMORY_SIZE', '512')),
+    max_entries=int(os.environ.get('GEMINI_CACHE_MAX_ENTRIES', '10000'))
+)
+
+# Identical in-flight Gemini calls share one upstream request
+gemini_single_flight = SingleFlight()
+
+# Bound concurrent upstream calls; excess callers queue by endpoint priority
+gemini_limiter = PriorityLimiter(
+    max_concurrent=int(os.environ.get('GEMINI_MAX_CONCURRENT', '8')),
+    max_queue=int(os.environ.get('GEMINI_MAX_QUEUE', '64')),
+    max_wait=float(os.environ.get('GEMINI_MAX_WAIT', '10'))
+)
+
+# Retry, timeout and hedging policy per endpoint; override with GEMINI_RETRY_<ENDPOINT>
+gemini_callers = {
+    endpoint: RetryingCaller(retry_policy_from_env(endpoint, policy))
+    for endpoint, policy in {
+        "chat": RetryPolicy(max_attempts=2, attempt_timeout=20.0, deadline=30.0, hedge=True),
+        "chat_summary": RetryPolicy(max_attempts=2, attempt_timeout=20.0, deadline=30.0),
+        "resume": RetryPolicy(max_attempts=3, attempt_timeout=45.0, deadline=90.0),
+        "match": RetryPolicy(max_attempts=3, attempt_timeout=30.0, deadline=60.0),
+        "default": RetryPolicy(),
+    }.items()
+}
+
+# Token counts reported by Gemini, per endpoint
+gemini_token_usage = {}
+
+# "single" asks for match details and feedback in one JSON-mode call; "two_call" is the original flow
+JOB_MATCH_MODE = os.environ.get('JOB_MATCH_MODE', 'single')
+
+# Resumes with a text layer skip the Gemini extraction call; scanned ones still use it
+resume_extraction_stats = ExtractionStats()
+RESUME_MIN_TEXT_CHARS = int(os.environ.get('RESUME_MIN_TEXT_CHARS', '100'))
+
+# Time to first token of streamed chat replies, our main chat latency metric
+chat_ttft = LatencyTracker(window=1000, min_samples=1)
+
+@app.exception_handler(UpstreamBusyError)
+async def upstream_busy_handler(request, exc: UpstreamBusyError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+# Largest single resume accepted, and how many files a bulk upload parses at once
+RESUME_MAX_BYTES = int(os.environ.get('RESUME_MAX_BYTES', str(10 * 1024 * 1024)))
+RESUME_BULK_CONCURRENCY = int(os.environ.get('RESUME_BULK_CONCURRENCY', '4'))
+RESUME_BULK_MAX_BYTES = int(os.environ.get('RESUME_BULK_MAX_BYTES', str(1024 * 1024 * 1024)))
+RUN_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# Oversized request bodies are cut off before they are spooled; single-resume
+# requests get room for base64's 4/3 expansion plus multipart framing
+single_resume_request_bytes = RESUME_MAX_BYTES * 4 // 3 + 64 * 1024
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/api/resume/parse": single_resume_request_bytes,
+    "/api/resume/jobs": single_resume_request_bytes,
+    "/api/resume/bulk": RESUME_BULK_MAX_BYTES,
+})
+
+@app.exception_handler(UploadTooLargeError)
+async def upload_too_large_handler(request, exc: UploadTooLargeError):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+# Skills taxonomy compiled into a single-pass matcher; SKILLS_TAXONOMY_PATH can point to a larger one
+DEFAULT_SKILLS = [
+    'python', 'javascript', 'react', 'node.js', 'html', 'css', 'sql',
+    'project management', 'leadership', 'communication', 'teamwork',
+    'problem solving', 'critical thinking', 'time management'
+]
 try:
-    with open("courses.json", "r") as f:
-        courses_data = json.load(f)
+    skill_taxonomy = SkillTaxonomy.load(os.environ.get('SKILLS_TAXONOMY_PATH', 'skills_taxonomy.json'))
 except FileNotFoundError:
-    print("Warning: courses.json not found, using empty courses list")
-    courses_data = []
+    print("Warning: skills taxonomy not found, using the built-in skills list")
+    skill_taxonomy = SkillTaxonomy({skill: [] for skill in DEFAULT_SKILLS})
+
+# The embedding model loads in the background at startup (see start_background_services)
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'  # Fast but effective model
+embedding_model = None
+
+def load_embedding_model():
+    """Import sentence-transformers (and torch) and load the model; runs on a startup thread"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+# Course catalog: a compiled store that workers share through mmap, plus its
+# vector index ("exact", "ivf", "hnsw" or "pq"). The exact index can store
+# vectors as "float32", "float16" or "int8"; compressed indexes rescore their
+# best COURSE_INDEX_RERANK candidates against the mapped float32 embeddings.
+COURSES_PATH = os.environ.get('COURSES_PATH', 'courses.json')
+EMBEDDINGS_CACHE_DIR = os.environ.get('EMBEDDINGS_CACHE_DIR', 'embeddings_cache')
+COURSE_INDEX_BACKEND = os.environ.get('COURSE_INDEX_BACKEND', 'exact')
+
+def load_course_catalog(stats: Optional[dict] = None, get_model=lambda: embedding_model) -> CourseCatalog:
+    """Map the compiled course store (compiling it if courses.json changed) and load its index"""
+    store = load_course_store(
+        COURSES_PATH, get_model, EMBEDDING_MODEL_NAME, EMBEDDINGS_CACHE_DIR, skill_taxonomy, stats
+    )
+    index = load_or_build_index(
+        COURSE_INDEX_BACKEND,
+        store.embeddings,
+        EMBEDDINGS_CACHE_DIR,
+        store.fingerprint,
+        dtype=os.environ.get('COURSE_INDEX_DTYPE', 'float32'),
+        rerank=int(os.environ.get('COURSE_INDEX_RERANK', '100'))
+    ) if len(store) else None
+    return CourseCatalog(store, index)
+
+# Loaded at startup, then replaced as a whole by reload_course_catalog();
+# readers take one reference per request
+course_catalog = None
+
+# Reload state; COURSES_RELOAD_INTERVAL > 0 also polls courses.json for changes
+COURSES_RELOAD_INTERVAL = float(os.environ.get('COURSES_RELOAD_INTERVAL', '0'))
+course_reload_lock = asyncio.Lock()
+course_reload_stats = {
+    "reloads": 0,
+    "in_progress": False,
+    "last_duration_ms": None,
+    "last_encoded": None,
+    "last_reused": None,
+    "last_error": None,
+}
+
+# Embedding and similarity work runs in a bounded pool, off the event loop;
+# it gets the model once startup has loaded it
+embedding_pool = EmbeddingWorkerPool(
+    None,
+    EMBEDDING_MODEL_NAME,
+    kind=os.environ.get('EMBEDDING_EXECUTOR', 'thread'),
+    max_workers=int(os.environ.get('EMBEDDING_WORKERS', '2'))
+)
+
+# Concurrent recommendation queries are encoded together in micro-batches
+query_batcher = QueryBatcher(
+    embedding_pool,
+    window_ms=float(os.environ.get('EMBED_BATCH_WINDOW_MS', '5')),
+    max_batch=int(os.environ.get('EMBED_MAX_BATCH', '32'))
+)
+
+# Popular skill lists skip encoding (keyed by model) and search (keyed by catalog version)
+query_embedding_cache = TTLCache(
+    maxsize=int(os.environ.get('QUERY_CACHE_SIZE', '4096')),
+    ttl=float(os.environ.get('QUERY_CACHE_TTL', '86400'))
+)
+recommendation_cache = TTLCache(
+    maxsize=int(os.environ.get('RECOMMENDATION_CACHE_SIZE', '2048')),
+    ttl=float(os.environ.get('RECOMMENDATION_CACHE_TTL', '3600'))
+)
+
+# Local skills comparison; skill-name embeddings are cached in its vocabulary
+skill_matcher = SkillMatcher(
+    threshold=float(os.environ.get('SKILL_MATCH_THRESHOLD', '0.8')),
+    taxonomy=skill_taxonomy
+)
+
+# Job-seeker profiles that companies can search for a posting; sized once the model is loaded
+candidate_index = None
+
+# Startup progress reported by /readyz; timings are in milliseconds
+startup_state = {
+    "ready": False,
+    "model_loaded": False,
+    "catalog_loaded": False,
+    "warmed_up": False,
+    "error": None,
+    "timings_ms": {},
+}
+background_tasks = []
+
+async def start_background_services():
+    """
+    Load the model and the course catalog concurrently, then warm up.
+
+    Mapping an up-to-date course store doesn't need the model, so the catalog
+    usually finishes first; it only waits for the model when courses have to
+    be encoded. The warm-up runs one forward pass and one index search so the
+    first real request doesn't pay for lazy initialization.
+    """
+    start = time.perf_counter()
+    timings = startup_state["timings_ms"]
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup")
+    try:
+        loop = asyncio.get_running_loop()
+        model_future = executor.submit(load_embedding_model)
+
+        async def model_ready():
+            global embedding_model, candidate_index
+            model = await asyncio.wrap_future(model_future)
+            embedding_pool.model = embedding_model = model
+            candidate_index = CandidateIndex(model.get_sentence_embedding_dimension())
+            timings["model_load"] = (time.perf_counter() - start) * 1000
+            startup_state["model_loaded"] = True
 
-# Initialize the embedding model
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')  # Fast but effective model
+        async def catalog_ready():
+            global course_catalog
+            course_catalog = await loop.run_in_executor(executor, load_course_catalog, None, model_future.result)
+            timings["catalog_load"] = (time.perf_counter() - start) * 1000
+            startup_state["catalog_loaded"] = True
 
-# Pre-compute course embeddings
-course_descriptions = []
-for course in courses_data:
-    # Combine name and abstract for better representation
-    combined_text = f"{course['course_name']} {course.get('abstract', '')}"
-    course_descriptions.append(combined_text)
+        await asyncio.gather(model_ready(), catalog_ready())
 
-# Generate and store embeddings
-course_embeddings = embedding_model.encode(course_descriptions) if course_descriptions else np.array([])
+        warmup_start = time.perf_counter()
+        vector = await embedding_pool.encode(["python sql communication"])
+        if course_catalog.index is not None:
+            await embedding_pool.run(course_catalog.index.search, vector[0], 5)
+        timings["warmup"] = (time.perf_counter() - warmup_start) * 1000
+        startup_state["warmed_up"] = True
+    except Exception as e:
+        startup_state["error"] = f"{type(e).__name__}: {e}"
+        print(f"Warning: startup failed: {startup_state['error']}")
+        return
+    finally:
+        executor.shutdown(wait=False)
+
+    timings["total"] = (time.perf_counter() - start) * 1000
+    startup_state["ready"] = True
+    if COURSES_RELOAD_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(watch_courses_file(COURSES_RELOAD_INTERVAL)))
+
+def require_ready():
+    """Dependency for endpoints that need the embedding model or course catalog"""
+    if startup_state["error"]:
+        raise HTTPException(status_code=503, detail="Service failed to start, see /readyz")
+    if not startup_state["ready"]:
+        raise HTTPException(
+            status_code=503,
+            detail="Service is starting up, try again shortly",
+            headers={"Retry-After": "5"}
+        )
 
 # ==================== Pydantic Models ====================
 
@@ -165,6 +411,13 @@ class SkillMatchResult(BaseModel):
     missing_skills: List[str]
     match_percentage: float
     job_compatibility: float
+    required: Optional[Dict[str, Any]] = None
+    preferred: Optional[Dict[str, Any]] = None
+    fuzzy_matches: Optional[Dict[str, str]] = {}
+
+class SkillMatchRequest(BaseModel):
+    resume: ResumeBase
+    job: JobBase
 
 class ChatMessage(BaseModel):
     message: str
@@ -180,35 +433,179 @@ class JobMatchResponse(BaseModel):
     match_details: Dict[str, Any]
     feedback: Dict[str, Any]
 
+# Upper bound on how many candidates one search can return
+CANDIDATE_SEARCH_MAX_LIMIT = int(os.environ.get('CANDIDATE_SEARCH_MAX_LIMIT', '100'))
+
+class CandidateSearchRequest(BaseModel):
+    job: JobBase
+    limit: Optional[int] = Field(10, ge=0, le=CANDIDATE_SEARCH_MAX_LIMIT)
+
+class CandidateMatch(BaseModel):
+    profile_id: str
+    name: Optional[str] = None
+    email: Optional[str] = None
+    skills: Optional[str] = None
+    score: float
+
+# Upper bound on top_n, so one batch request can't monopolize the Gemini queue
+BATCH_MATCH_MAX_TOP_N = int(os.environ.get('BATCH_MATCH_MAX_TOP_N', '25'))
+
+class BatchJobMatchRequest(BaseModel):
+    resume: ResumeBase
+    jobs: List[JobBase]
+    top_n: Optional[int] = Field(10, ge=0, le=BATCH_MATCH_MAX_TOP_N,
+                                 description="How many of the best pre-ranked jobs get a full Gemini analysis")
+
+# Response schema for single-call job matching (Gemini JSON mode)
+class RequirementMatch(BaseModel):
+    matched: List[str]
+    missing: List[str]
+    match_rate: float
+
+class SkillsSectionMatch(BaseModel):
+    score: float
+    required: RequirementMatch
+    preferred: RequirementMatch
+
+class ExperienceEntryMatch(BaseModel):
+    role: str
+    company: str
+    match_percentage: float
+    matching_terms: List[str]
+
+class ExperienceSectionMatch(BaseModel):
+    score: float
+    matching_aspects: List[str]
+    missing_aspects: List[str]
+    experience_entries: List[ExperienceEntryMatch]
+
+class EducationSectionMatch(BaseModel):
+    score: float
+    matching_aspects: List[str]
+    missing_aspects: List[str]
+    highest_education: Optional[str] = None
+
+class MatchSections(BaseModel):
+    skills: SkillsSectionMatch
+    experience: ExperienceSectionMatch
+    education: EducationSectionMatch
+
+class MatchWeights(BaseModel):
+    skills: float
+    experience: float
+    education: float
+
+class MatchDetails(BaseModel):
+    overall_match: float
+    sections: MatchSections
+    weights_applied: MatchWeights
+
+class MatchFeedback(BaseModel):
+    strengths: List[str]
+    improvements: List[str]
+    missing_skills: List[str]
+    keyword_recommendations: List[str]
+
+class JobMatchAnalysis(BaseModel):
+    match_details: MatchDetails
+    feedback: MatchFeedback
+
 # ==================== Helper Functions ====================
 
-async def call_gemini(prompt: str, file_path: str = None) -> Union[dict, str]:
-    """Generic function to call Gemini API"""
-    try:
-        contents = [prompt]
+def config_fingerprint(config: types.GenerateContentConfig) -> str:
+    """Serialized config for cache keys; response_schema may be a Pydantic class, which doesn't dump"""
+    schema = config.response_schema
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        schema = schema.model_json_schema()
+    elif isinstance(schema, BaseModel):
+        schema = schema.model_dump(mode="json", exclude_none=True)
+    return config.model_dump_json(exclude={"response_schema"}, exclude_none=True) + json.dumps(schema, sort_keys=True, default=str)
 
-        if file_path:
-            mime_type = ".pdf"
-            contents.append(types.Part.from_bytes(data=file_path, mime_type=mime_type))
+async def call_gemini(prompt: str, file_path: str = None, endpoint: str = "default",
+                      config: Optional[types.GenerateContentConfig] = None,
+                      mime_type: Optional[str] = None) -> Union[dict, str]:
+    """Generic function to call Gemini API; mime_type describes the attached bytes (sniffed if omitted)"""
+    config = config or types.GenerateContentConfig()
+    fingerprint = response_fingerprint(gemini_model, prompt, file_path, config_fingerprint(config))
 
-        config = types.GenerateContentConfig()
-        response = await gemini_client.aio.models.generate_content(
-            model=gemini_model,
-            contents=contents,
-            config=config
-        )
+    if gemini_response_cache is not None:
+        cached = await gemini_response_cache.get(fingerprint)
+        if cached is not None:
+            return cached
+
+    return await gemini_single_flight.run(
+        fingerprint, lambda: generate_gemini_response(prompt, file_path, config, fingerprint, endpoint, mime_type)
+    )
+
+async def generate_gemini_response(prompt: str, file_path, config: types.GenerateContentConfig,
+                                   fingerprint: str, endpoint: str = "default",
+                                   mime_type: Optional[str] = None) -> Union[dict, str]:
+    """Send a generate_content request (retrying transient failures) and cache a successful result"""
+    priority = ENDPOINT_PRIORITIES.get(endpoint, ENDPOINT_PRIORITIES["default"])
+    caller = gemini_callers.get(endpoint, gemini_callers["default"])
+
+    contents = [prompt]
+    if file_path:
+        contents.append(types.Part.from_bytes(data=file_path, mime_type=mime_type or sniff_mime(file_path)))
+
+    async def attempt():
+        # Each attempt (and hedge) takes its own slot, so backoff sleeps don't hold one
+        async with gemini_limiter.slot(priority):
+            return await gemini_client.aio.models.generate_content(
+                model=gemini_model,
+                contents=contents,
+                config=config
+            )
+
+    try:
+        response = await caller.call(attempt)
+        record_token_usage(endpoint, response)
 
         if response.text:
             try:
-                return parse_json(response.text)
+                result = parse_json(response.text)
             except:
-                return response.text
+                result = response.text
         else:
             return {"error": "No text response from the model."}
 
+    except UpstreamBusyError:
+        raise
     except Exception as e:
         return {"error": f"Gemini API call failed: {str(e)}"}
 
+    # Only successful generations are cached
+    if gemini_response_cache is not None and not (isinstance(result, dict) and "error" in result):
+        await gemini_response_cache.set(fingerprint, result)
+    return result
+
+def record_token_usage(endpoint: str, response):
+    """Accumulate prompt/output token counts reported by Gemini"""
+    usage = getattr(response, "usage_metadata", None)
+    totals = gemini_token_usage.setdefault(endpoint, {"calls": 0, "prompt_tokens": 0, "output_tokens": 0})
+    totals["calls"] += 1
+    if usage is not None:
+        totals["prompt_tokens"] += usage.prompt_token_count or 0
+        totals["output_tokens"] += usage.candidates_token_count or 0
+
+async def stream_gemini(prompt: str, endpoint: str = "default"):
+    """Yield text chunks from a streaming Gemini generation as they arrive"""
+    priority = ENDPOINT_PRIORITIES.get(endpoint, ENDPOINT_PRIORITIES["default"])
+    async with gemini_limiter.slot(priority):
+        stream = await gemini_client.aio.models.generate_content_stream(
+            model=gemini_model,
+            contents=[prompt],
+            config=types.GenerateContentConfig()
+        )
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+def sse_event(data: dict, event: str = None) -> str:
+    """Format one Server-Sent Events message"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
 def parse_json(text):
     """Extract and parse JSON from text response"""
     start_idx = text.find('{')
@@ -264,140 +661,236 @@ def get_mime_type(file_path: str) -> str:
         return 'application/octet-stream'
 
 def extract_skills_from_text(text: str) -> List[str]:
-    """Extract skills from text using a simple keyword approach"""
-    common_skills = [
-        'python', 'javascript', 'react', 'node.js', 'html', 'css', 'sql',
-        'project management', 'leadership', 'communication', 'teamwork',
-        'problem solving', 'critical thinking', 'time management'
-    ]
-    
-    found_skills = []
-    for skill in common_skills:
-        if skill.lower() in text.lower():
-            found_skills.append(skill)
-            
-    return found_skills
+    """Extract skills from text with a single pass over the skills taxonomy"""
+    return skill_taxonomy.find(text)
 
-def get_course_recommendations(skills_needed: List[str], limit: int = 5) -> List[CourseRecommendation]:
+async def get_course_recommendations(skills_needed: List[str], limit: int = 5) -> List[CourseRecommendation]:
     """Get course recommendations based on skills needed"""
-    if not course_embeddings.size:
+    # One snapshot for the whole request, even if a reload swaps the catalog meanwhile
+    catalog = course_catalog
+    if catalog.index is None:
         return []
+    
+    # The embedding model is uncased, so lowercasing doesn't change the query vector
+    normalized_skills = tuple(" ".join(s.lower().split()) for s in skills_needed)
+    result_key = (catalog.version, normalized_skills, limit)
+    cached = recommendation_cache.get(result_key)
+    if cached is not None:
+        return list(cached)
         
     # Generate embedding for the skills needed
-    skills_text = " ".join(skills_needed)
-    skills_embedding = embedding_model.encode([skills_text])[0]
+    skills_text = " ".join(normalized_skills)
+    query_key = (EMBEDDING_MODEL_NAME, skills_text)
+    skills_embedding = query_embedding_cache.get(query_key)
+    if skills_embedding is None:
+        skills_embedding = await query_batcher.encode(skills_text)
+        query_embedding_cache.set(query_key, skills_embedding)
     
-    # Calculate similarity
-    similarity_scores = cosine_similarity([skills_embedding], course_embeddings)[0]
+    # Get top matches with their cosine similarity
+    top_indices, top_scores = await embedding_pool.run(catalog.index.search, skills_embedding, limit)
     
-    # Get top matches
-    top_indices = similarity_scores.argsort()[-limit:][::-1]
+    # Canonical names of the skills asked for, so aliases match too
+    needed = {skill_taxonomy.canonical(skill) or normalize_skill(skill) for skill in skills_needed}
     
     recommendations = []
-    for idx in top_indices:
-        course = courses_data[idx]
-        
-        # Extract skills taught in this course
-        course_skills = extract_skills_from_text(
-            f"{course['course_name']} {course.get('abstract', '')}"
-        )
-        
-        # Find matching skills
-        matching_skills = [skill for skill in course_skills if skill.lower() in [s.lower() for s in skills_needed]]
+    for idx, score in zip(top_indices.tolist(), top_scores.tolist()):
+        # Find matching skills among those taught in this course
+        matching_skills = [skill for skill in catalog.store.skills(idx) if skill in needed]
         
+        # Fields are decoded from the mapped store only for the courses returned
         recommendations.append(
             CourseRecommendation(
-                course_id=course.get('course_id', idx),
-                course_name=course['course_name'],
-                abstract=course.get('abstract', ''),
-                instructor=course.get('instructor', ''),
-                relevance_score=float(similarity_scores[idx]),
+                course_id=int(catalog.store.field(idx, 'course_id')),
+                course_name=catalog.store.field(idx, 'course_name'),
+                abstract=catalog.store.field(idx, 'abstract'),
+                instructor=catalog.store.field(idx, 'instructor'),
+                relevance_score=float(score),
                 skill_match=matching_skills,
-                course_url=course.get('course_url', '')
+                course_url=catalog.store.field(idx, 'course_url')
             )
         )
     
-    return recommendations
+    recommendation_cache.set(result_key, recommendations)
+    return list(recommendations)
 
-# ==================== API Endpoints ====================
+async def reload_course_catalog() -> dict:
+    """
+    Rebuild the course catalog from courses.json and swap it in.
 
-@app.post("/api/resume/parse", response_model=ProfileBase)
-async def parse_resume(file: Optional[UploadFile] = None, file_content: Annotated[Optional[str], Form()]=None):
-    """Parse a resume and return structured data"""
-    if not file and not file_content:
-        raise HTTPException(status_code=400, detail="Either file or file_content must be provided")
-    
-    # Handle file upload
-    if file:
-        # Save the uploaded file to a temporary location
+    Compiling and indexing run off the event loop while requests keep using
+    the current catalog; only new or changed courses are encoded.
+    """
+    global course_catalog
+    async with course_reload_lock:
+        course_reload_stats["in_progress"] = True
+        start = time.perf_counter()
+        stats = {}
         try:
-            contents = await file.read()
-            # Extract text from the resume using Gemini
-            prompt = """
-            Extract all text and key information from this resume.
-            Return the extracted text in a clear, structured way.
-            """
-            
-            resume_text = await call_gemini(prompt, contents)
+            catalog = await asyncio.to_thread(load_course_catalog, stats)
         except Exception as e:
-            print(e)
-    else:
-        # Handle base64 encoded file content
+            course_reload_stats["last_error"] = str(e)
+            print(f"Warning: course catalog reload failed: {e}")
+            raise
+        finally:
+            course_reload_stats["in_progress"] = False
+
+        changed = catalog.version != course_catalog.version
+        course_catalog = catalog
+        if changed:
+            # Old entries can't be hit again (keys include the version); free them now
+            recommendation_cache.clear()
+        course_reload_stats.update(
+            reloads=course_reload_stats["reloads"] + 1,
+            last_duration_ms=(time.perf_counter() - start) * 1000,
+            last_encoded=stats["encoded"],
+            last_reused=stats["reused"],
+            last_error=None,
+        )
+        return {"changed": changed, "courses": len(catalog.store), **course_reload_stats}
+
+async def watch_courses_file(interval: float):
+    """Reload the catalog whenever courses.json's size or mtime changes"""
+    def signature():
         try:
-            resume_text = base64.b64decode(file_content).decode('utf-8')
-        except Exception as e:
-            print(e)
+            stat = os.stat(COURSES_PATH)
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    last_seen = signature()
+    while True:
+        await asyncio.sleep(interval)
+        current = signature()
+        if current == last_seen:
+            continue
+        last_seen = current
+        try:
+            await reload_course_catalog()
+        except Exception:
+            # Already recorded; keep serving the previous catalog and keep watching
+            pass
 
+async def summarize_chat_history(previous: Optional[str], turns: List[str]) -> Optional[str]:
+    """Fold older chat turns into a short running summary; None if Gemini couldn't produce one"""
+    earlier = f"Summary of the conversation before these turns:\n{previous}\n" if previous else ""
+    conversation = "\n".join(turns)
+    prompt = f"""
+    Summarize this conversation between a user and a career guidance assistant, for the assistant's own reference.
+    Keep what matters for later advice: the user's background, disability and accommodation needs, goals and
+    preferences, advice already given, and open questions. Write plain text, at most 150 words.
     
-    # Parse the extracted text to fit our database schema
+    {earlier}
+    Conversation:
+    {conversation}
+    """
+    try:
+        summary = await call_gemini(prompt, endpoint="chat_summary")
+    except UpstreamBusyError as e:
+        print(f"Warning: chat history summary skipped: {e}")
+        return None
+    return summary.strip() if isinstance(summary, str) else None
+
+# Chat history past this many (estimated) tokens is folded into a cached summary, in blocks of messages
+chat_history = ChatHistoryManager(
+    summarize_chat_history,
+    budget_tokens=int(os.environ.get('CHAT_HISTORY_BUDGET_TOKENS', '1500')),
+    block_messages=int(os.environ.get('CHAT_HISTORY_BLOCK_MESSAGES', '4'))
+)
+
+async def build_chat_prompt(chat_request: ChatMessage) -> str:
+    """Build the career assistant prompt from the profile, token-budgeted history and new message"""
+    # Create system prompt for the career guidance chatbot
+    system_prompt = """
+    You are a career guidance assistant specializing in supporting people with various disabilities in their professional journeys. 
+    Provide practical, actionable advice that considers both the realities of the job market and the unique considerations that may apply to people with disabilities.
+
+    When responding:
+    - Be empathetic but realistic and practical
+    - Consider the whole person, not just their disability
+    - Offer specific, actionable next steps when possible
+    - Cover all career fields equally well, not focusing exclusively on tech
+    - Balance technical skill development with soft skills advice
+    - If user profile information is available, personalize your response accordingly
+
+    Your goal is to help users navigate their career paths with confidence, providing honest guidance that acknowledges challenges while focusing on opportunities.
+    """
+    
+    # Recent turns go in verbatim; older ones are replaced by a cached summary once over budget
+    summary, recent_turns = await chat_history.compact(chat_request.history or [])
+    conversation_context = "\n".join(recent_turns)
+    if summary:
+        conversation_context = f"Summary of the earlier conversation:\n{summary}\n\n{conversation_context}"
+    
+    # Add profile context if provided
+    profile_context = ""
+    if chat_request.profile:
+        profile_data = chat_request.profile.model_dump(exclude_unset=True, exclude_none=True)
+        profile_context = "User Profile Information:\n"
+        
+        # Add disability type if available
+        if profile_data.get("disabilityType"):
+            profile_context += f"- Disability type: {profile_data['disabilityType']}\n"
+        
+        # Add skills if available
+        if profile_data.get("skills"):
+            profile_context += f"- Skills: {profile_data['skills']}\n"
+            
+        # Add education if available
+        if profile_data.get("education"):
+            profile_context += f"- Education: {profile_data['education']}\n"
+            
+        # Add experience if available
+        if profile_data.get("experience"):
+            profile_context += f"- Experience: {profile_data['experience']}\n"
+            
+        # Add work preferences if available
+        if profile_data.get("workpreference"):
+            profile_context += f"- Work preference: {profile_data['workpreference']}\n"
+            
+        # Add accommodations if available
+        if profile_data.get("accommodations"):
+            profile_context += f"- Accommodations needed: {profile_data['accommodations']}\n"
+            
+        # Add job type preference if available
+        if profile_data.get("jobtype"):
+            profile_context += f"- Preferred job type: {profile_data['jobtype']}\n"
+            
+        # Add certifications if available
+        if profile_data.get("certifications"):
+            profile_context += f"- Certifications: {profile_data['certifications']}\n"
+    
+    # Build the full prompt
     prompt = f"""
-    Based on the following resume text, extract information to fit the profile schema.
+    {system_prompt}
     
-    Resume text:
-    {resume_text}
+    {profile_context}
     
-    Return ONLY a valid JSON object with the following structure:
-    {{
-        "email": "email@example.com",
-        "userType": "job-seeker",
-        "name": "Full Name",
-        "disabilityType": "Type of disability if mentioned",
-        "education": "Education history in text format",
-        "experience": "Work experience in text format",
-        "skills": "Comma-separated list of skills",
-        "certifications": "Any certifications mentioned",
-        "jobtype": "Preferred job type if mentioned",
-        "workpreference": "Remote, on-site, etc. if mentioned",
-        "accommodations": "Any needed accommodations if mentioned"
-    }}
+    {conversation_context}
     
-    If some information is not found, use empty strings or null values.
+    User: {chat_request.message}
+    
+    Assistant:
     """
     
-    profile_data = await call_gemini(prompt)
+    return prompt
+
+async def local_skill_match(resume_data: dict, job_data: dict) -> dict:
+    """Compare resume and job skills locally (exact plus embedding-similarity matching)"""
+    resume_skills = skill_names(resume_data.get("skills"))
+    if not resume_skills and resume_data.get("full_text"):
+        resume_skills = extract_skills_from_text(resume_data["full_text"])
+    required = job_data.get("required_skills") or []
+    preferred = job_data.get("preferred_skills") or []
     
-    if isinstance(profile_data, str):
-        try:
-            profile_data = json.loads(profile_data)
-        except:
-            profile_data = {
-                "email": "unknown@example.com",
-                "userType": "job-seeker",
-                "name": "",
-                "education": "",
-                "experience": "",
-                "skills": "",
-                "certifications": ""
-            }
+    # Only skill names never seen before need a trip through the model
+    unseen = skill_matcher.missing_from_vocabulary(resume_skills + skill_names(required) + skill_names(preferred))
+    if unseen:
+        skill_matcher.add_to_vocabulary(unseen, await embedding_pool.encode(unseen))
     
-    return ProfileBase(**profile_data)
+    return skill_matcher.match(resume_skills, required, preferred)
 
-@app.post("/api/jobs/match", response_model=JobMatchResponse)
-async def match_job_with_resume(match_request: JobMatchRequest):
-    """Match a job with a resume and return compatibility details"""
-    job_data = match_request.job.model_dump()
-    resume_data = match_request.resume.model_dump()
-    
+def build_match_prompt(resume_data: dict, job_data: dict, skill_precheck: Optional[dict] = None) -> str:
+    """Prompt asking Gemini for a detailed resume/job match assessment"""
     # Format the data for Gemini
     prompt = f"""
     Analyze how well this resume matches the job description and return a detailed assessment.
@@ -454,20 +947,43 @@ async def match_job_with_resume(match_request: JobMatchRequest):
     
     Calculate overall_match as the weighted average of section scores.
     """
+    if skill_precheck:
+        prompt += f"""
+    A deterministic pre-check (exact and similarity matching of skill names) found:
+    {json.dumps({key: skill_precheck[key] for key in ("required", "preferred", "fuzzy_matches")})}
+    Use it as a starting point for the skills section, correcting it where the resume shows otherwise.
+    """
+    return prompt
+
+def default_match_details() -> dict:
+    """Zero-score match details used when Gemini returns nothing usable"""
+    return {
+        "overall_match": 0.0,
+        "sections": {
+            "skills": {"score": 0.0, "required": {"matched": [], "missing": [], "match_rate": 0.0}, 
+                       "preferred": {"matched": [], "missing": [], "match_rate": 0.0}},
+            "experience": {"score": 0.0, "matching_aspects": [], "missing_aspects": [], "experience_entries": []},
+            "education": {"score": 0.0, "matching_aspects": [], "missing_aspects": [], "highest_education": None}
+        },
+        "weights_applied": {"skills": 0.6, "experience": 0.3, "education": 0.1}
+    }
+
+def default_feedback() -> dict:
+    """Generic feedback used when Gemini returns nothing usable"""
+    return {
+        "strengths": ["No specific strengths identified"],
+        "improvements": ["Consider providing more detailed information in your resume"],
+        "missing_skills": [],
+        "keyword_recommendations": []
+    }
+
+async def match_two_calls(resume_data: dict, job_data: dict, skill_precheck: Optional[dict] = None):
+    """Original flow: one call for match details, a second for feedback on them"""
+    prompt = build_match_prompt(resume_data, job_data, skill_precheck)
+    match_details = await call_gemini(prompt, endpoint="match")
     
-    match_details = await call_gemini(prompt)
-    
-    if not isinstance(match_details, dict):
-        match_details = {
-            "overall_match": 0.0,
-            "sections": {
-                "skills": {"score": 0.0, "required": {"matched": [], "missing": [], "match_rate": 0.0}, 
-                           "preferred": {"matched": [], "missing": [], "match_rate": 0.0}},
-                "experience": {"score": 0.0, "matching_aspects": [], "missing_aspects": [], "experience_entries": []},
-                "education": {"score": 0.0, "matching_aspects": [], "missing_aspects": [], "highest_education": None}
-            },
-            "weights_applied": {"skills": 0.6, "experience": 0.3, "education": 0.1}
-        }
+    if not isinstance(match_details, dict) or "error" in match_details:
+        match_details = default_match_details()
     
     # Generate feedback based on the match details
     feedback_prompt = f"""
@@ -495,15 +1011,79 @@ async def match_job_with_resume(match_request: JobMatchRequest):
     Provide 3-5 items in each list. Be specific and actionable in your recommendations.
     """
     
-    feedback = await call_gemini(feedback_prompt)
+    feedback = await call_gemini(feedback_prompt, endpoint="match")
+    
+    if not isinstance(feedback, dict) or "error" in feedback:
+        feedback = default_feedback()
+    
+    return match_details, feedback
+
+async def match_single_call(resume_data: dict, job_data: dict, skill_precheck: Optional[dict] = None):
+    """Get match details and feedback together from one JSON-mode call"""
+    prompt = build_match_prompt(resume_data, job_data, skill_precheck) + """
+    Also provide constructive feedback to improve the resume for this job: 3-5 specific,
+    actionable items each for strengths, improvements, missing_skills and keyword_recommendations.
+    Return both as {"match_details": <the assessment above>, "feedback": <the feedback>}.
+    """
+    config = types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=JobMatchAnalysis
+    )
+    analysis = await call_gemini(prompt, endpoint="match", config=config)
     
+    if not isinstance(analysis, dict) or "error" in analysis:
+        analysis = {}
+    match_details = analysis.get("match_details")
+    feedback = analysis.get("feedback")
+    if not isinstance(match_details, dict):
+        match_details = default_match_details()
     if not isinstance(feedback, dict):
-        feedback = {
-            "strengths": ["No specific strengths identified"],
-            "improvements": ["Consider providing more detailed information in your resume"],
-            "missing_skills": [],
-            "keyword_recommendations": []
-        }
+        feedback = default_feedback()
+    
+    return match_details, feedback
+
+def skill_names(skills: Optional[List[Dict[str, Any]]]) -> List[str]:
+    """Names from a list of skill dicts such as [{"name": "Python", ...}]"""
+    return [skill["name"] for skill in skills or [] if isinstance(skill, dict) and isinstance(skill.get("name"), str)
+            and skill["name"]]
+
+def resume_embedding_text(resume: ResumeBase) -> str:
+    """Text used to embed a resume for local pre-ranking"""
+    if resume.full_text:
+        return resume.full_text
+    parts = skill_names(resume.skills)
+    for entry in resume.experience or []:
+        parts.extend(str(entry.get(key, "")) for key in ("role", "description"))
+    for entry in resume.education or []:
+        parts.extend(str(entry.get(key, "")) for key in ("degree", "field_of_study"))
+    return " ".join(part for part in parts if part)
+
+def job_embedding_text(job: JobBase) -> str:
+    """Text used to embed a job posting for local pre-ranking"""
+    skills = skill_names(job.required_skills) + skill_names(job.preferred_skills)
+    return f"{job.title} {' '.join(skills)} {job.description_text}"
+
+def profile_embedding_text(profile: ProfileBase) -> str:
+    """Text used to embed a job-seeker profile for candidate search"""
+    fields = (profile.skills, profile.experience, profile.education,
+              profile.certifications, profile.jobtype, profile.workpreference)
+    return " ".join(field for field in fields if field)
+
+async def prerank_jobs(resume: ResumeBase, jobs: List[JobBase]):
+    """Cosine similarity of the resume to every job, computed locally in one encode pass"""
+    texts = [resume_embedding_text(resume)] + [job_embedding_text(job) for job in jobs]
+    vectors = normalize_rows(await embedding_pool.encode(texts))
+    scores = vectors[1:] @ vectors[0]
+    return top_k(scores, len(jobs)), scores
+
+async def analyze_job_match(resume_data: dict, job_data: dict, mode: Optional[str] = None) -> dict:
+    """Score a resume against a job and generate feedback using the configured match mode"""
+    mode = mode or JOB_MATCH_MODE
+    skill_precheck = await local_skill_match(resume_data, job_data)
+    if mode == "two_call":
+        match_details, feedback = await match_two_calls(resume_data, job_data, skill_precheck)
+    else:
+        match_details, feedback = await match_single_call(resume_data, job_data, skill_precheck)
     
     # Calculate the match score
     match_score = match_details.get("overall_match", 0.0)
@@ -514,7 +1094,297 @@ async def match_job_with_resume(match_request: JobMatchRequest):
         "feedback": feedback
     }
 
-@app.post("/api/courses/recommend", response_model=List[CourseRecommendation])
+async def read_resume_upload(file: Optional[UploadFile], file_content: Optional[str]):
+    """Bytes and file name of a resume sent as a multipart file or base64 form field, up to RESUME_MAX_BYTES"""
+    if not file and not file_content:
+        raise HTTPException(status_code=400, detail="Either file or file_content must be provided")
+    if file:
+        return await asyncio.to_thread(read_upload, file.file, RESUME_MAX_BYTES), file.filename
+    try:
+        return await asyncio.to_thread(decode_base64, file_content, RESUME_MAX_BYTES), None
+    except UploadTooLargeError:
+        raise
+    except ValueError:
+        raise HTTPException(status_code=400, detail="file_content is not valid base64")
+
+async def parse_resume_contents(contents: bytes, filename: Optional[str] = None) -> ProfileBase:
+    """Extract a resume's text (locally when possible) and structure it into a profile"""
+    resume_text = None
+    try:
+        # Text-layer PDFs, DOCX and TXT are read locally, chosen by the file's content
+        mime_type = sniff_mime(contents)
+        if mime_type == OCTET_MIME and filename and get_mime_type(filename) != TEXT_MIME:
+            # Sniffing already ruled out text, so a binary file named .txt stays octet-stream
+            mime_type = get_mime_type(filename)
+        resume_text = await asyncio.to_thread(
+            timed_extract, contents, mime_type, resume_extraction_stats, RESUME_MIN_TEXT_CHARS
+        )
+        
+        if resume_text is None:
+            # Scanned or image-only documents: extract text from the resume using Gemini
+            prompt = """
+            Extract all text and key information from this resume.
+            Return the extracted text in a clear, structured way.
+            """
+            
+            resume_text = await call_gemini(prompt, contents, endpoint="resume", mime_type=mime_type)
+    except UpstreamBusyError:
+        raise
+    except Exception as e:
+        print(e)
+    
+    if resume_text is None:
+        raise HTTPException(status_code=400, detail="Could not read the resume file")
+    
+    # Parse the extracted text to fit our database schema
+    prompt = f"""
+    Based on the following resume text, extract information to fit the profile schema.
+    
+    Resume text:
+    {resume_text}
+    
+    Return ONLY a valid JSON object with the following structure:
+    {{
+        "email": "email@example.com",
+        "userType": "job-seeker",
+        "name": "Full Name",
+        "disabilityType": "Type of disability if mentioned",
+        "education": "Education history in text format",
+        "experience": "Work experience in text format",
+        "skills": "Comma-separated list of skills",
+        "certifications": "Any certifications mentioned",
+        "jobtype": "Preferred job type if mentioned",
+        "workpreference": "Remote, on-site, etc. if mentioned",
+        "accommodations": "Any needed accommodations if mentioned"
+    }}
+    
+    If some information is not found, use empty strings or null values.
+    """
+    
+    profile_data = await call_gemini(prompt, endpoint="resume")
+    
+    if isinstance(profile_data, str):
+        try:
+            profile_data = json.loads(profile_data)
+        except:
+            profile_data = {
+                "email": "unknown@example.com",
+                "userType": "job-seeker",
+                "name": "",
+                "education": "",
+                "experience": "",
+                "skills": "",
+                "certifications": ""
+            }
+    
+    return ProfileBase(**profile_data)
+
+async def run_resume_job(payload) -> dict:
+    """Resume job handler: parse the queued upload into a JSON-ready profile"""
+    contents, filename = payload
+    return (await parse_resume_contents(contents, filename)).model_dump()
+
+
+# Background resume parsing; RESUME_JOB_STORE is "memory" or "sqlite:<path>"
+resume_job_queue = ResumeJobQueue(
+    run_resume_job,
+    create_job_store(
+        os.environ.get('RESUME_JOB_STORE', 'memory'),
+        max_entries=int(os.environ.get('RESUME_JOB_MAX_ENTRIES', '10000')),
+        ttl=float(os.environ.get('RESUME_JOB_TTL', '86400'))
+    ),
+    workers=int(os.environ.get('RESUME_JOB_WORKERS', '4')),
+    max_queue=int(os.environ.get('RESUME_JOB_MAX_QUEUE', '1000')),
+    # Uploads waiting for a worker are held in memory; cap their total size
+    max_queued_bytes=int(os.environ.get('RESUME_JOB_MAX_QUEUED_BYTES', str(256 * 1024 * 1024))),
+    # Optional comma-separated allowlist; webhooks always have to resolve to public addresses
+    webhook_hosts=[host.strip() for host in os.environ.get('RESUME_WEBHOOK_HOSTS', '').split(',')]
+)
+
+# Per-file outcomes of bulk runs, kept apart from resume jobs so a big run can't evict live job records;
+# RESUME_BULK_STORE is "memory" or "sqlite:<path>"
+resume_bulk_store = create_job_store(
+    os.environ.get('RESUME_BULK_STORE', 'memory'),
+    max_entries=int(os.environ.get('RESUME_BULK_MAX_ENTRIES', '50000')),
+    ttl=float(os.environ.get('RESUME_BULK_TTL', '86400')),
+    table="resume_bulk_runs"
+)
+
+# ==================== API Endpoints ====================
+
+@app.post("/api/resume/parse", response_model=ProfileBase)
+async def parse_resume(file: Optional[UploadFile] = None, file_content: Annotated[Optional[str], Form()]=None):
+    """Parse a resume and return structured data"""
+    contents, filename = await read_resume_upload(file, file_content)
+    return await parse_resume_contents(contents, filename)
+
+@app.post("/api/resume/jobs", status_code=202)
+async def submit_resume_job(file: Optional[UploadFile] = None, file_content: Annotated[Optional[str], Form()]=None,
+                            webhook_url: Annotated[Optional[str], Form()]=None):
+    """
+    Queue a resume for parsing and return a job id at once
+    
+    Poll GET /api/resume/jobs/{job_id} for the result, or pass webhook_url to
+    have the finished job record POSTed there. Webhooks must be http(s) URLs
+    on public addresses (and on RESUME_WEBHOOK_HOSTS, when that is set).
+    """
+    contents, filename = await read_resume_upload(file, file_content)
+    try:
+        record = await resume_job_queue.submit((contents, filename), webhook_url, size=len(contents))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=429, detail="Too many queued resume jobs, try again later",
+                            headers={"Retry-After": "30"})
+    return {"job_id": record["job_id"], "status": record["status"], "status_url": f"/api/resume/jobs/{record['job_id']}"}
+
+@app.get("/api/resume/jobs/{job_id}")
+async def get_resume_job(job_id: str):
+    """Status of a queued resume job; "result" holds the parsed profile once the job is done"""
+    record = await resume_job_queue.get(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Resume job not found")
+    return record
+
+@app.post("/api/resume/bulk")
+async def bulk_parse_resumes(files: Annotated[List[UploadFile], File()], run_id: Annotated[Optional[str], Form()]=None):
+    """
+    Parse many resumes, streaming one NDJSON line per file as each finishes
+    
+    files may be resumes, zip archives of resumes, or both. Each line carries
+    the file name, its sha256, "status" ("done" or "failed") and the parsed
+    profile in "result"; a final line reports the totals. Pass the run_id
+    from the X-Run-Id header (or the totals line) to a retry to skip files
+    that already succeeded and re-parse only the rest. Multipart requests are
+    capped at 1000 files; send larger batches as zip archives.
+    """
+    if run_id is None:
+        run_id = uuid.uuid4().hex
+    elif not RUN_ID_PATTERN.fullmatch(run_id):
+        raise HTTPException(status_code=400, detail="run_id must be 1-64 letters, digits, '-' or '_'")
+    
+    async def parse(contents: bytes, filename: str) -> dict:
+        return (await parse_resume_contents(contents, filename)).model_dump()
+    
+    async def results():
+        totals = {"done": 0, "failed": 0, "resumed": 0}
+        async for result in ingest_resumes(
+            iter_resume_files(files, RESUME_MAX_BYTES), parse, resume_bulk_store, run_id,
+            concurrency=RESUME_BULK_CONCURRENCY, max_bytes=RESUME_MAX_BYTES
+        ):
+            totals[result["status"]] += 1
+            totals["resumed"] += int(result["resumed"])
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"run_id": run_id, "complete": True, **totals}) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson", headers={"X-Run-Id": run_id})
+
+@app.post("/api/jobs/match", response_model=JobMatchResponse, dependencies=[Depends(require_ready)])
+async def match_job_with_resume(match_request: JobMatchRequest, mode: Optional[str] = None):
+    """
+    Match a job with a resume and return compatibility details
+    
+    mode overrides the JOB_MATCH_MODE setting for this request: "single" asks for
+    match details and feedback in one structured call, "two_call" uses separate calls.
+    """
+    if mode not in (None, "single", "two_call"):
+        raise HTTPException(status_code=400, detail="mode must be 'single' or 'two_call'")
+    job_data = match_request.job.model_dump()
+    resume_data = match_request.resume.model_dump()
+    
+    return await analyze_job_match(resume_data, job_data, mode)
+
+@app.post("/api/jobs/match/batch", dependencies=[Depends(require_ready)])
+async def match_jobs_batch(batch_request: BatchJobMatchRequest, mode: Optional[str] = None):
+    """
+    Match one resume against many jobs, streaming NDJSON results
+    
+    All jobs are pre-ranked locally by embedding similarity; only the top_n
+    (at most BATCH_MATCH_MAX_TOP_N) go through the full Gemini analysis, no
+    more than GEMINI_MAX_CONCURRENT of them at a time. Analyzed jobs are
+    streamed as they finish, followed by the remaining jobs with their
+    pre-rank score only.
+    """
+    if mode not in (None, "single", "two_call"):
+        raise HTTPException(status_code=400, detail="mode must be 'single' or 'two_call'")
+    if not batch_request.jobs:
+        raise HTTPException(status_code=400, detail="At least one job must be provided")
+    
+    ranking, scores = await prerank_jobs(batch_request.resume, batch_request.jobs)
+    top_n = max(0, batch_request.top_n if batch_request.top_n is not None else 10)
+    shortlisted = ranking[:top_n].tolist()
+    resume_data = batch_request.resume.model_dump()
+    
+    # At most one request's worth of Gemini slots at a time, so the shortlist doesn't flood the shared queue
+    analysis_slots = asyncio.Semaphore(max(1, gemini_limiter.max_concurrent))
+    
+    async def analyze(job_index: int) -> dict:
+        result = {"job_index": job_index, "prerank_score": float(scores[job_index]), "analyzed": True}
+        try:
+            async with analysis_slots:
+                result.update(await analyze_job_match(resume_data, batch_request.jobs[job_index].model_dump(), mode))
+        except UpstreamBusyError as e:
+            result.update({"analyzed": False, "error": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            # One failed analysis gets an error line instead of cutting the stream off
+            result.update({"analyzed": False, "error": f"Job match analysis failed: {e}"})
+        return result
+    
+    async def results():
+        tasks = [asyncio.ensure_future(analyze(job_index)) for job_index in shortlisted]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield json.dumps(await next_result) + "\n"
+        finally:
+            # Stop outstanding analyses if the client went away
+            for task in tasks:
+                task.cancel()
+        for job_index in ranking[top_n:].tolist():
+            yield json.dumps({"job_index": job_index, "prerank_score": float(scores[job_index]), "analyzed": False}) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.post("/api/skills/match", response_model=SkillMatchResult, dependencies=[Depends(require_ready)])
+async def match_skills(match_request: SkillMatchRequest):
+    """Compare resume skills with a job's required and preferred skills, without calling Gemini"""
+    return await local_skill_match(match_request.resume.model_dump(), match_request.job.model_dump())
+
+@app.put("/api/candidates/{profile_id}", dependencies=[Depends(require_ready)])
+async def index_candidate(profile_id: str, profile: ProfileBase):
+    """Add or update a job-seeker profile in the candidate index"""
+    if profile.userType != "job-seeker":
+        raise HTTPException(status_code=400, detail="Only job-seeker profiles can be indexed")
+    text = profile_embedding_text(profile)
+    if not text:
+        raise HTTPException(status_code=400, detail="Profile has no skills, experience or education to index")
+    
+    vector = await query_batcher.encode(text)
+    candidate_index.upsert(profile_id, vector, {
+        "name": profile.name,
+        "email": profile.email,
+        "skills": profile.skills
+    })
+    return {"profile_id": profile_id, "indexed": True, "candidates": len(candidate_index)}
+
+@app.delete("/api/candidates/{profile_id}", dependencies=[Depends(require_ready)])
+async def remove_candidate(profile_id: str):
+    """Remove a profile from the candidate index"""
+    if not candidate_index.remove(profile_id):
+        raise HTTPException(status_code=404, detail="Profile is not indexed")
+    return {"profile_id": profile_id, "indexed": False, "candidates": len(candidate_index)}
+
+@app.post("/api/candidates/search", response_model=List[CandidateMatch], dependencies=[Depends(require_ready)])
+async def search_candidates(search_request: CandidateSearchRequest):
+    """Rank indexed job-seeker profiles by similarity to a job posting"""
+    query = await query_batcher.encode(job_embedding_text(search_request.job))
+    limit = 10 if search_request.limit is None else search_request.limit
+    matches = await embedding_pool.run(candidate_index.search, query, limit)
+    return [
+        CandidateMatch(profile_id=profile_id, score=score, **summary)
+        for profile_id, score, summary in matches
+    ]
+
+@app.post("/api/courses/recommend", response_model=List[CourseRecommendation], dependencies=[Depends(require_ready)])
 async def recommend_courses(request: CourseRecommendationRequest):
     """Recommend courses based on skills and job requirements"""
     # Combine existing skills and missing skills
@@ -529,7 +1399,7 @@ async def recommend_courses(request: CourseRecommendationRequest):
         skills_to_search.append(request.desired_job)
     
     # Get course recommendations
-    recommendations = get_course_recommendations(skills_to_search, limit=request.limit)
+    recommendations = await get_course_recommendations(skills_to_search, limit=request.limit)
     
     return recommendations
 
@@ -541,83 +1411,10 @@ async def chat_with_assistant(chat_request: ChatMessage):
     If a profile is provided, the response will be personalized based on the user's
     background, skills, disability information, and career preferences.
     """
-    # Create system prompt for the career guidance chatbot
-    system_prompt = """
-    You are a career guidance assistant specializing in supporting people with various disabilities in their professional journeys. 
-    Provide practical, actionable advice that considers both the realities of the job market and the unique considerations that may apply to people with disabilities.
-
-    When responding:
-    - Be empathetic but realistic and practical
-    - Consider the whole person, not just their disability
-    - Offer specific, actionable next steps when possible
-    - Cover all career fields equally well, not focusing exclusively on tech
-    - Balance technical skill development with soft skills advice
-    - If user profile information is available, personalize your response accordingly
-
-    Your goal is to help users navigate their career paths with confidence, providing honest guidance that acknowledges challenges while focusing on opportunities.
-    """
-    
-    # Format the conversation history if provided
-    conversation_context = ""
-    if chat_request.history:
-        for msg in chat_request.history:
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            conversation_context += f"{role.capitalize()}: {content}\n"
-    
-    # Add profile context if provided
-    profile_context = ""
-    if chat_request.profile:
-        profile_data = chat_request.profile.model_dump(exclude_unset=True, exclude_none=True)
-        profile_context = "User Profile Information:\n"
-        
-        # Add disability type if available
-        if profile_data.get("disabilityType"):
-            profile_context += f"- Disability type: {profile_data['disabilityType']}\n"
-        
-        # Add skills if available
-        if profile_data.get("skills"):
-            profile_context += f"- Skills: {profile_data['skills']}\n"
-            
-        # Add education if available
-        if profile_data.get("education"):
-            profile_context += f"- Education: {profile_data['education']}\n"
-            
-        # Add experience if available
-        if profile_data.get("experience"):
-            profile_context += f"- Experience: {profile_data['experience']}\n"
-            
-        # Add work preferences if available
-        if profile_data.get("workpreference"):
-            profile_context += f"- Work preference: {profile_data['workpreference']}\n"
-            
-        # Add accommodations if available
-        if profile_data.get("accommodations"):
-            profile_context += f"- Accommodations needed: {profile_data['accommodations']}\n"
-            
-        # Add job type preference if available
-        if profile_data.get("jobtype"):
-            profile_context += f"- Preferred job type: {profile_data['jobtype']}\n"
-            
-        # Add certifications if available
-        if profile_data.get("certifications"):
-            profile_context += f"- Certifications: {profile_data['certifications']}\n"
-    
-    # Build the full prompt
-    prompt = f"""
-    {system_prompt}
-    
-    {profile_context}
-    
-    {conversation_context}
-    
-    User: {chat_request.message}
-    
-    Assistant:
-    """
+    prompt = await build_chat_prompt(chat_request)
     
     # Call Gemini for a response
-    response = await call_gemini(prompt)
+    response = await call_gemini(prompt, endpoint="chat")
     
     # Handle different response types
     if isinstance(response, dict) and "error" in response:
@@ -627,6 +1424,125 @@ async def chat_with_assistant(chat_request: ChatMessage):
     else:
         return {"response": str(response)}
 
+@app.post("/api/chat/stream")
+async def stream_chat_with_assistant(chat_request: ChatMessage):
+    """
+    Chat with the career guidance assistant, streaming the reply as Server-Sent Events
+
+    Each event carries {"text": ...} with the next chunk of the reply; the stream
+    ends with a "done" event, or an "error" event if generation fails midway.
+    """
+    # Timed from request entry, so a history summary call counts toward time to first token
+    started = time.monotonic()
+    prompt = await build_chat_prompt(chat_request)
+    chunks = stream_gemini(prompt, endpoint="chat")
+
+    # Wait for the first chunk here so overload still surfaces as a 429/503
+    first_chunk, first_error = None, None
+    try:
+        first_chunk = await chunks.__anext__()
+        chat_ttft.record(time.monotonic() - started)
+    except StopAsyncIteration:
+        pass
+    except UpstreamBusyError:
+        raise
+    except Exception as e:
+        first_error = e
+
+    async def events():
+        if first_error is not None:
+            yield sse_event({"error": f"I apologize, but I encountered an error: {first_error}"}, event="error")
+            return
+        if first_chunk is None:
+            yield sse_event({}, event="done")
+            return
+        yield sse_event({"text": first_chunk})
+        try:
+            async for text in chunks:
+                yield sse_event({"text": text})
+        except Exception as e:
+            yield sse_event({"error": f"I apologize, but I encountered an error: {e}"}, event="error")
+            return
+        yield sse_event({}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/admin/courses/reload", status_code=202, dependencies=[Depends(require_ready)])
+async def trigger_course_reload(x_admin_token: Optional[str] = Header(None)):
+    """
+    Start a background reload of courses.json; poll GET on the same path for the result
+    
+    Requires ADMIN_TOKEN to be set and sent as X-Admin-Token. Only the worker
+    that receives the request reloads; under --workers N the others pick up
+    the change only through the COURSES_RELOAD_INTERVAL watcher, so set that
+    too when running several workers.
+    """
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Course reload is disabled; set ADMIN_TOKEN to enable it")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token.encode('utf-8'), admin_token.encode('utf-8')):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if course_reload_lock.locked():
+        return {"status": "in_progress"}
+    task = asyncio.create_task(reload_course_catalog())
+    # Failures are recorded in course_reload_stats; don't log them as unretrieved
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return {"status": "started"}
+
+@app.get("/api/admin/courses/reload", dependencies=[Depends(require_ready)])
+async def course_reload_status():
+    """Outcome of the most recent catalog reload"""
+    return {
+        "catalog_version": course_catalog.version,
+        "courses": len(course_catalog.store),
+        **course_reload_stats
+    }
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: the model and course catalog are loaded and warmed up"""
+    return JSONResponse(status_code=200 if startup_state["ready"] else 503, content=startup_state)
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Cache, batching and queue counters for monitoring"""
+    return {
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "recommendation_cache": recommendation_cache.stats(),
+        "query_batcher": query_batcher.stats(),
+        "gemini_response_cache": gemini_response_cache.stats() if gemini_response_cache else None,
+        "gemini_single_flight": gemini_single_flight.stats(),
+        "gemini_limiter": gemini_limiter.stats(),
+        "gemini_retries": {endpoint: caller.stats() for endpoint, caller in gemini_callers.items()},
+        "gemini_token_usage": gemini_token_usage,
+        "resume_extraction": resume_extraction_stats.stats(),
+        "resume_jobs": resume_job_queue.stats(),
+        "course_index": {
+            "backend": course_catalog.index.backend,
+            "courses": len(course_catalog.index),
+            "resident_bytes": getattr(course_catalog.index, "nbytes", None)
+        } if course_catalog is not None and course_catalog.index is not None else None,
+        "course_reload": course_reload_stats,
+        "candidate_index": candidate_index.stats() if candidate_index is not None else None,
+        "startup": startup_state,
+        "skill_vocabulary": skill_matcher.vocabulary.stats(),
+        "chat_stream": {
+            "ttft_p50_ms": (chat_ttft.percentile(50) or 0.0) * 1000,
+            "ttft_p95_ms": (chat_ttft.percentile(95) or 0.0) * 1000,
+            "samples": len(chat_ttft.samples)
+        },
+        "chat_history": chat_history.stats()
+    }
+
 # Run the application
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,685 @@
+import argparse
+import asyncio
+import os
+import time
+import numpy as np
+from pprint import pprint
+
+# Configuration
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
+EMBEDDINGS_CACHE_DIR = os.getenv("EMBEDDINGS_CACHE_DIR", "embeddings_cache")
+
+def percentile_ms(samples, q):
+    """Percentile of a list of durations in seconds, as milliseconds"""
+    return float(np.percentile(samples, q) * 1000) if samples else 0.0
+
+def synthetic_embeddings(n: int, dim: int = 384, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """Clustered random vectors that behave roughly like sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal(size=(clusters, dim), dtype=np.float32)
+    vectors = rng.standard_normal(size=(n, dim), dtype=np.float32)
+    vectors *= 0.6
+    vectors += centers[rng.integers(0, clusters, size=n)]
+    return vectors
+
+def load_catalog_embeddings():
+    """Embeddings saved by the service, if any"""
+    if not os.path.isdir(EMBEDDINGS_CACHE_DIR):
+        return None
+    for name in sorted(os.listdir(EMBEDDINGS_CACHE_DIR)):
+        if name.startswith("course_embeddings-") and name.endswith(".npy"):
+            return np.load(os.path.join(EMBEDDINGS_CACHE_DIR, name), mmap_mode='r')
+    return None
+
+# ==================== Vector Index ====================
+
+def benchmark_index(args):
+    """Recall@k and latency of ANN backends against the exact baseline"""
+    from vector_index import ExactIndex, build_index, evaluate_index
+
+    print("\n===== BENCHMARKING COURSE INDEX =====")
+    embeddings = None if args.synthetic else load_catalog_embeddings()
+    if embeddings is None:
+        print(f"Using {args.size} synthetic embeddings")
+        embeddings = synthetic_embeddings(args.size)
+    else:
+        print(f"Using {len(embeddings)} catalog embeddings from {EMBEDDINGS_CACHE_DIR}")
+
+    rng = np.random.default_rng(1)
+    sample = np.asarray(embeddings[rng.choice(len(embeddings), size=min(args.queries, len(embeddings)), replace=False)])
+    queries = sample + rng.normal(scale=0.05, size=sample.shape).astype(np.float32)
+
+    baseline = ExactIndex(embeddings)
+    for backend in args.backends:
+        start = time.perf_counter()
+        try:
+            index = build_index(backend, embeddings)
+        except RuntimeError as e:
+            print(f"\n{backend}: skipped ({e})")
+            continue
+        print(f"\n{backend}: built in {time.perf_counter() - start:.2f}s")
+        pprint(evaluate_index(index, baseline, queries, args.k))
+
+# ==================== Top-k Selection ====================
+
+def _naive_top_k(embeddings, query, k):
+    """Per-request normalization and a full sort, as the original sklearn path did"""
+    scores = (embeddings @ query) / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query))
+    return np.argsort(scores)[-k:][::-1]
+
+def benchmark_topk(args):
+    """Exact search latency and memory by catalog size, storage dtype and batch size"""
+    from vector_index import ExactIndex
+
+    print("\n===== BENCHMARKING EXACT TOP-K =====")
+    results = []
+    for size in args.sizes:
+        embeddings = synthetic_embeddings(size)
+        queries = synthetic_embeddings(args.queries, seed=1)
+        row = {"size": size}
+
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            _naive_top_k(embeddings, query, args.k)
+            samples.append(time.perf_counter() - start)
+        row["naive_p50_ms"] = percentile_ms(samples, 50)
+
+        expected = None
+        for dtype in args.dtypes:
+            index = ExactIndex(embeddings, dtype)
+            samples = []
+            for query in queries:
+                start = time.perf_counter()
+                index.search(query, args.k)
+                samples.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            found, _ = index.search_batch(queries, args.k)
+            batch_seconds = time.perf_counter() - start
+
+            if expected is None:
+                expected = found
+            overlap = sum(len(set(a.tolist()) & set(b.tolist())) for a, b in zip(expected, found))
+            row[dtype] = {
+                "p50_ms": percentile_ms(samples, 50),
+                "p99_ms": percentile_ms(samples, 99),
+                "batched_ms_per_query": batch_seconds * 1000 / len(queries),
+                "recall_vs_first_dtype": overlap / expected.size,
+                "mb": round(index.nbytes / 2**20, 1),
+            }
+            del index
+        del embeddings
+        pprint(row)
+        results.append(row)
+    return results
+
+# ==================== Quantized Storage ====================
+
+def benchmark_quantized(args):
+    """Resident memory and recall@k of compressed indexes, with and without exact rerank"""
+    import tempfile
+    from vector_index import ExactIndex, PQIndex, evaluate_index
+
+    print("\n===== BENCHMARKING QUANTIZED STORAGE =====")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            # Rerank reads from a memory-mapped artifact, as in the service
+            path = os.path.join(tmp, f"embeddings-{size}.npy")
+            np.save(path, synthetic_embeddings(size))
+            embeddings = np.load(path, mmap_mode='r')
+            queries = synthetic_embeddings(args.queries, seed=1)
+            baseline = ExactIndex(embeddings)
+            pq = PQIndex.build(embeddings)
+
+            row = {"size": size, "float32_mb": round(baseline.nbytes / 2**20, 1)}
+            for name, index in (
+                ("int8", ExactIndex(embeddings, "int8")),
+                ("int8+rerank", ExactIndex(embeddings, "int8", rerank=args.rerank)),
+                ("pq", PQIndex(embeddings, pq.codebooks, pq.codes, rerank=0)),
+                ("pq+rerank", PQIndex(embeddings, pq.codebooks, pq.codes, rerank=args.rerank)),
+            ):
+                stats = evaluate_index(index, baseline, queries, args.k)
+                row[name] = {
+                    "mb": round(index.nbytes / 2**20, 1),
+                    f"recall@{args.k}": stats[f"recall@{args.k}"],
+                    "p50_ms": stats["p50_ms"],
+                    "p99_ms": stats["p99_ms"],
+                }
+            del baseline, pq, embeddings
+            pprint(row)
+            results.append(row)
+    return results
+
+# ==================== Mixed Load ====================
+
+CHAT_REQUEST = {"message": "What accommodations should I ask for in a software job?", "history": []}
+RECOMMEND_REQUEST = {"skills": ["python", "sql", "react"], "missing_skills": ["docker"], "limit": 5}
+
+async def _timed_post(client, path, payload, samples):
+    start = time.perf_counter()
+    response = await client.post(f"{BASE_URL}{path}", json=payload)
+    response.raise_for_status()
+    samples.append(time.perf_counter() - start)
+
+async def _chat_latencies(client, count):
+    samples = []
+    await asyncio.gather(*[_timed_post(client, "/api/chat", CHAT_REQUEST, samples) for _ in range(count)])
+    return samples
+
+async def _recommend_load(client, stop, samples):
+    while not stop.is_set():
+        await _timed_post(client, "/api/courses/recommend", RECOMMEND_REQUEST, samples)
+
+async def benchmark_mixed(args):
+    """Chat latency alone vs. while recommendation clients keep the server busy"""
+    import httpx
+
+    print("\n===== BENCHMARKING CHAT UNDER MIXED LOAD =====")
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        idle = await _chat_latencies(client, args.chats)
+
+        stop = asyncio.Event()
+        recommend_samples = []
+        load = [asyncio.create_task(_recommend_load(client, stop, recommend_samples)) for _ in range(args.recommend_clients)]
+        loaded = await _chat_latencies(client, args.chats)
+        stop.set()
+        await asyncio.gather(*load)
+
+    pprint({
+        "chat_idle_p50_ms": percentile_ms(idle, 50),
+        "chat_idle_p99_ms": percentile_ms(idle, 99),
+        "chat_loaded_p50_ms": percentile_ms(loaded, 50),
+        "chat_loaded_p99_ms": percentile_ms(loaded, 99),
+        "recommend_requests": len(recommend_samples),
+        "recommend_p99_ms": percentile_ms(recommend_samples, 99),
+    })
+
+# ==================== Chat Streaming ====================
+
+async def benchmark_ttft(args):
+    """Full-response latency of /api/chat vs time to first token of /api/chat/stream"""
+    import httpx
+
+    print("\n===== BENCHMARKING CHAT TIME TO FIRST TOKEN =====")
+    blocking, first_token, streamed = [], [], []
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        for i in range(args.requests):
+            request = dict(CHAT_REQUEST, message=f"{CHAT_REQUEST['message']} ({i})")
+
+            start = time.perf_counter()
+            response = await client.post(f"{BASE_URL}/api/chat", json=request)
+            response.raise_for_status()
+            blocking.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            async with client.stream("POST", f"{BASE_URL}/api/chat/stream", json=request) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line.startswith("data:") and len(first_token) < len(blocking):
+                        first_token.append(time.perf_counter() - start)
+            streamed.append(time.perf_counter() - start)
+
+    pprint({
+        "chat_p50_ms": percentile_ms(blocking, 50),
+        "chat_p95_ms": percentile_ms(blocking, 95),
+        "stream_ttft_p50_ms": percentile_ms(first_token, 50),
+        "stream_ttft_p95_ms": percentile_ms(first_token, 95),
+        "stream_total_p50_ms": percentile_ms(streamed, 50),
+    })
+
+# ==================== Startup ====================
+
+def import_profile(module: str = "ai_service"):
+    """
+    Import cost of module from `python -X importtime`, in ms.
+
+    Returns the module's cumulative time and its direct imports, slowest first;
+    anything those pull in is counted in their cumulative time.
+    """
+    import subprocess
+    import sys
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True)
+    total = None
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0 and name.strip() == module:
+            total = int(cumulative) / 1000
+        elif depth == 1:
+            children.append((name.strip(), int(cumulative) / 1000))
+        elif depth == 0:
+            # A previous top-level import; its children don't belong to module
+            children = []
+    return total, sorted(children, key=lambda m: -m[1]), result.returncode
+
+async def benchmark_startup(args):
+    """Import-time profile of ai_service, then time to /healthz and /readyz for a fresh server"""
+    import subprocess
+    import sys
+    import httpx
+
+    print("\n===== BENCHMARKING STARTUP =====")
+    total, modules, returncode = import_profile()
+    pprint({
+        "import_ok": returncode == 0,
+        "import_total_ms": total,
+        "slowest_imports_ms": [(name, round(ms, 1)) for name, ms in modules[:args.top]],
+    })
+    if args.no_server:
+        return
+
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "ai_service:app", "--port", str(args.port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    live = ready = None
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=2.0) as client:
+            while ready is None and time.perf_counter() - start < args.timeout and server.poll() is None:
+                try:
+                    if live is None and (await client.get("/healthz")).status_code == 200:
+                        live = time.perf_counter() - start
+                    response = await client.get("/readyz")
+                    if response.status_code == 200:
+                        ready = time.perf_counter() - start
+                        state = response.json()
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.05)
+    finally:
+        server.terminate()
+        server.wait()
+
+    pprint({
+        "healthz_ms": live * 1000 if live is not None else None,
+        "readyz_ms": ready * 1000 if ready is not None else None,
+        "server_timings_ms": state["timings_ms"] if ready is not None else None,
+    })
+
+# ==================== Resume Extraction ====================
+
+def sample_pdf(lines, text_layer: bool = True) -> bytes:
+    """Single-page PDF; without a text layer it stands in for a scanned resume"""
+    stream = "BT /F1 11 Tf 72 740 Td " + " ".join(f"({line}) Tj 0 -14 Td" for line in lines) + " ET" if text_layer else ""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return pdf
+
+def benchmark_extraction(args):
+    """Per-format local extraction latency and the share of uploads that skip the Gemini extraction call"""
+    from resume_text import ExtractionStats, sniff_mime, timed_extract
+    from test_ai import make_docx, sample_resume_text
+
+    print("\n===== BENCHMARKING RESUME TEXT EXTRACTION =====")
+    if args.files:
+        uploads = []
+        for path in args.files:
+            with open(path, "rb") as f:
+                uploads.append(f.read())
+    else:
+        lines = [line.strip().replace("(", "").replace(")", "") for line in sample_resume_text.splitlines() if line.strip()]
+        uploads = [
+            sample_resume_text.encode("utf-8"),
+            make_docx(sample_resume_text),
+            sample_pdf(lines),
+            sample_pdf(lines, text_layer=False),
+        ]
+
+    stats = ExtractionStats()
+    for _ in range(args.repeat):
+        for data in uploads:
+            timed_extract(data, sniff_mime(data), stats)
+    pprint(stats.stats())
+
+# ==================== Upload Memory ====================
+
+def _peak_mb(func, *args) -> float:
+    """Peak Python heap allocated while func runs, in MB"""
+    import tracemalloc
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+def benchmark_upload(args):
+    """Peak memory per request for reading, decoding and handing an upload to extraction"""
+    import base64
+    import hashlib
+    import io
+    import tempfile
+    from resume_text import sniff_mime
+    from uploads import UploadTooLargeError, decode_base64, read_upload
+
+    print("\n===== BENCHMARKING UPLOAD MEMORY =====")
+    limit = args.limit_mb * 1024 * 1024
+    print(f"Limit: {args.limit_mb} MB; peak heap in MB per request")
+    print(f"{'size':>8} {'file read':>10} {'oversize old/new':>17} {'base64 old/new':>15} {'share':>7}")
+    for size_mb in args.sizes:
+        data = os.urandom(size_mb * 1024 * 1024)
+        encoded = base64.b64encode(data).decode('ascii')
+        # Starlette spools multipart files like this; past 1 MB they live on disk
+        spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        spool.write(data)
+        del data
+
+        def old_file():
+            spool.seek(0)
+            spool.read()
+
+        def new_file(max_bytes):
+            try:
+                read_upload(spool, max_bytes)
+            except UploadTooLargeError:
+                pass
+
+        def handle(contents):
+            # Sniffing, hashing and extraction's BytesIO all reuse the one buffer
+            sniff_mime(contents)
+            hashlib.sha256(contents).hexdigest()
+            io.BytesIO(contents).read(1)
+
+        file_peak = _peak_mb(new_file, size_mb * 1024 * 1024)
+        oversize_old = _peak_mb(old_file)
+        oversize_new = _peak_mb(new_file, min(limit, size_mb * 1024 * 1024 - 1))
+        base64_old = _peak_mb(base64.b64decode, encoded)
+        base64_new = _peak_mb(decode_base64, encoded, size_mb * 1024 * 1024)
+        contents = read_upload(spool, size_mb * 1024 * 1024)
+        share_peak = _peak_mb(handle, contents)
+        print(f"{size_mb:>6}MB {file_peak:>10.1f} {oversize_old:>8.1f}/{oversize_new:<8.1f} "
+              f"{base64_old:>7.1f}/{base64_new:<7.1f} {share_peak:>7.2f}")
+        spool.close()
+
+# ==================== Job Match Modes ====================
+
+def _load_test_fixtures():
+    """Sample resume and job shared with test_ai.py"""
+    import test_ai
+    return test_ai.resume_data, test_ai.sample_job
+
+async def _match_token_usage(client):
+    response = await client.get(f"{BASE_URL}/api/metrics")
+    response.raise_for_status()
+    return response.json()["gemini_token_usage"].get("match", {"calls": 0, "prompt_tokens": 0, "output_tokens": 0})
+
+async def benchmark_match_modes(args):
+    """End-to-end latency and token usage of single-call vs two-call job matching"""
+    import httpx
+
+    print("\n===== BENCHMARKING JOB MATCH MODES =====")
+    resume, job = _load_test_fixtures()
+    results = {}
+    async with httpx.AsyncClient(timeout=180.0) as client:
+        for mode in ("two_call", "single"):
+            before = await _match_token_usage(client)
+            samples = []
+            for i in range(args.requests):
+                # Vary the job title so neither the response cache nor single-flight kicks in
+                payload = {"resume": resume, "job": dict(job, title=f"{job['title']} #{i} {mode}")}
+                start = time.perf_counter()
+                response = await client.post(f"{BASE_URL}/api/jobs/match", params={"mode": mode}, json=payload)
+                response.raise_for_status()
+                samples.append(time.perf_counter() - start)
+            after = await _match_token_usage(client)
+            results[mode] = {
+                "p50_ms": percentile_ms(samples, 50),
+                "p95_ms": percentile_ms(samples, 95),
+                "gemini_calls_per_match": (after["calls"] - before["calls"]) / args.requests,
+                "prompt_tokens_per_match": (after["prompt_tokens"] - before["prompt_tokens"]) / args.requests,
+                "output_tokens_per_match": (after["output_tokens"] - before["output_tokens"]) / args.requests,
+            }
+    pprint(results)
+
+# ==================== Chat History ====================
+
+def synthetic_chat(messages: int, seed: int = 0) -> list:
+    """Alternating user questions and longer assistant replies"""
+    rng = np.random.default_rng(seed)
+    words = ("career resume interview remote accommodation skills experience manager team training "
+             "schedule accessible role application portfolio network mentor feedback").split()
+    history = []
+    for i in range(messages):
+        length = 30 if i % 2 == 0 else 180
+        content = " ".join(rng.choice(words, size=length)) + f" ({i})"
+        history.append({"role": "user" if i % 2 == 0 else "assistant", "content": content})
+    return history
+
+async def _chat_token_usage(client):
+    response = await client.get(f"{BASE_URL}/api/metrics")
+    response.raise_for_status()
+    usage = response.json()["gemini_token_usage"]
+    return {endpoint: usage.get(endpoint, {"calls": 0, "prompt_tokens": 0}) for endpoint in ("chat", "chat_summary")}
+
+async def benchmark_chat_history(args):
+    """Prompt tokens and latency against conversation length, full history vs token-budgeted"""
+    from chat_history import ChatHistoryManager, estimate_tokens
+
+    print("\n===== BENCHMARKING CHAT HISTORY COMPACTION =====")
+
+    async def summarize(previous, turns):
+        # About the 150 words the summary prompt asks for
+        await asyncio.sleep(0)
+        return "The user is looking for remote roles and asked about accommodations. " * 15
+
+    def full_history(history):
+        context = ""
+        for msg in history:
+            context += f"{msg.get('role', 'user').capitalize()}: {msg.get('content', '')}\n"
+        return context
+
+    # Replay each conversation turn by turn, as a client resending its history would
+    manager = ChatHistoryManager(summarize, budget_tokens=args.budget, block_messages=args.block)
+    conversation = synthetic_chat(max(args.lengths))
+    print(f"Budget {args.budget} tokens, blocks of {args.block} messages (estimated tokens)")
+    print(f"{'messages':>8} {'full tokens':>12} {'sent tokens':>12} {'full ms':>8} {'budgeted ms':>12} {'summaries so far':>17}")
+    for length in range(2, max(args.lengths) + 1, 2):
+        history = conversation[:length]
+        start = time.perf_counter()
+        full_tokens = estimate_tokens(full_history(history))
+        full_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        summary, recent = await manager.compact(history)
+        sent_tokens = estimate_tokens("\n".join(recent)) + (estimate_tokens(summary) if summary else 0)
+        budgeted_ms = (time.perf_counter() - start) * 1000
+        if length in args.lengths:
+            print(f"{length:>8} {full_tokens:>12} {sent_tokens:>12} {full_ms:>8.3f} {budgeted_ms:>12.3f} "
+                  f"{manager.summary_calls:>17}")
+
+    if not args.live:
+        return
+    import httpx
+
+    print("\nLive /api/chat (needs a running server)")
+    results = {}
+    async with httpx.AsyncClient(timeout=180.0) as client:
+        for length in args.lengths:
+            # A fresh conversation per length, so only its own summary calls are counted
+            history = synthetic_chat(length, seed=length)
+            before = await _chat_token_usage(client)
+            start = time.perf_counter()
+            response = await client.post(f"{BASE_URL}/api/chat", json={"message": "What should I do next?", "history": history})
+            response.raise_for_status()
+            elapsed = time.perf_counter() - start
+            after = await _chat_token_usage(client)
+            results[length] = {
+                "latency_ms": elapsed * 1000,
+                "chat_prompt_tokens": after["chat"]["prompt_tokens"] - before["chat"]["prompt_tokens"],
+                "summary_prompt_tokens": after["chat_summary"]["prompt_tokens"] - before["chat_summary"]["prompt_tokens"],
+            }
+    pprint(results)
+
+# ==================== Local Skills Matching ====================
+
+def benchmark_skills(args):
+    """Per-pair latency of the local skills matcher once its vocabulary is warm"""
+    from sentence_transformers import SentenceTransformer
+    from skills import SkillMatcher
+
+    print("\n===== BENCHMARKING LOCAL SKILLS MATCHING =====")
+    resume, job = _load_test_fixtures()
+    resume_skills = [skill["name"] for skill in resume["skills"]]
+    matcher = SkillMatcher()
+    names = resume_skills + [skill["name"] for skill in job["required_skills"] + job["preferred_skills"]]
+    unseen = matcher.missing_from_vocabulary(names)
+    matcher.add_to_vocabulary(unseen, SentenceTransformer(args.model).encode(unseen))
+
+    samples = []
+    for _ in range(args.pairs):
+        start = time.perf_counter()
+        matcher.match(resume_skills, job["required_skills"], job["preferred_skills"])
+        samples.append(time.perf_counter() - start)
+    pprint({
+        "pairs": args.pairs,
+        "p50_ms": percentile_ms(samples, 50),
+        "p99_ms": percentile_ms(samples, 99),
+        "result": matcher.match(resume_skills, job["required_skills"], job["preferred_skills"]),
+    })
+
+# ==================== Query Micro-Batching ====================
+
+SKILL_QUERIES = [
+    "python sql react", "javascript node.js html css", "project management leadership",
+    "docker kubernetes aws", "data analysis excel statistics", "communication teamwork",
+    "machine learning tensorflow", "graphic design figma", "accounting bookkeeping",
+]
+
+async def _encode_throughput(batcher, clients, duration):
+    """Queries per second sustained by concurrent clients over duration seconds"""
+    deadline = time.perf_counter() + duration
+    completed = 0
+
+    async def client(i):
+        nonlocal completed
+        while time.perf_counter() < deadline:
+            await batcher.encode(f"{SKILL_QUERIES[(i + completed) % len(SKILL_QUERIES)]} {i}")
+            completed += 1
+
+    await asyncio.gather(*[client(i) for i in range(clients)])
+    return completed / duration
+
+async def benchmark_batching(args):
+    """Query encode throughput with and without micro-batching at several concurrency levels"""
+    from sentence_transformers import SentenceTransformer
+    from embeddings import EmbeddingWorkerPool, QueryBatcher
+
+    print("\n===== BENCHMARKING QUERY MICRO-BATCHING =====")
+    model = SentenceTransformer(args.model)
+    pool = EmbeddingWorkerPool(model, args.model, max_workers=args.workers)
+    results = []
+    for clients in args.clients:
+        unbatched = QueryBatcher(pool, window_ms=0, max_batch=1)
+        batched = QueryBatcher(pool, window_ms=args.window_ms, max_batch=args.max_batch)
+        results.append({
+            "clients": clients,
+            "unbatched_qps": round(await _encode_throughput(unbatched, clients, args.duration), 1),
+            "batched_qps": round(await _encode_throughput(batched, clients, args.duration), 1),
+            "mean_batch_size": round(batched.stats()["mean_batch_size"], 1),
+        })
+        pprint(results[-1])
+    pool.shutdown()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the AI service")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    index_parser = subparsers.add_parser("index", help="ANN recall and latency vs exact search")
+    index_parser.add_argument("--backends", nargs="+", default=["exact", "ivf", "hnsw"])
+    index_parser.add_argument("--size", type=int, default=100000)
+    index_parser.add_argument("--queries", type=int, default=200)
+    index_parser.add_argument("--k", type=int, default=10)
+    index_parser.add_argument("--synthetic", action="store_true", help="Ignore the saved catalog embeddings")
+    index_parser.set_defaults(func=benchmark_index)
+
+    topk_parser = subparsers.add_parser("topk", help="Exact top-k latency and memory from 1k to 1M courses")
+    topk_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    topk_parser.add_argument("--dtypes", nargs="+", default=["float32", "float16", "int8"])
+    topk_parser.add_argument("--queries", type=int, default=32)
+    topk_parser.add_argument("--k", type=int, default=10)
+    topk_parser.set_defaults(func=benchmark_topk)
+
+    quantized_parser = subparsers.add_parser("quantized", help="Memory and recall of int8/pq indexes by catalog size")
+    quantized_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    quantized_parser.add_argument("--queries", type=int, default=100)
+    quantized_parser.add_argument("--rerank", type=int, default=100)
+    quantized_parser.add_argument("--k", type=int, default=10)
+    quantized_parser.set_defaults(func=benchmark_quantized)
+
+    mixed_parser = subparsers.add_parser("mixed", help="Chat p99 with concurrent recommendation load (needs a running server)")
+    mixed_parser.add_argument("--chats", type=int, default=20)
+    mixed_parser.add_argument("--recommend-clients", type=int, default=16)
+    mixed_parser.set_defaults(func=benchmark_mixed)
+
+    ttft_parser = subparsers.add_parser("ttft", help="Chat latency vs streamed time to first token (needs a running server)")
+    ttft_parser.add_argument("--requests", type=int, default=10)
+    ttft_parser.set_defaults(func=benchmark_ttft)
+
+    startup_parser = subparsers.add_parser("startup", help="Import-time profile and time to /healthz and /readyz")
+    startup_parser.add_argument("--top", type=int, default=15)
+    startup_parser.add_argument("--port", type=int, default=8765)
+    startup_parser.add_argument("--timeout", type=float, default=300.0)
+    startup_parser.add_argument("--no-server", action="store_true", help="Only profile imports")
+    startup_parser.set_defaults(func=benchmark_startup)
+
+    extraction_parser = subparsers.add_parser("extraction", help="Local resume text extraction latency per format")
+    extraction_parser.add_argument("--files", nargs="*", help="Resume files to use instead of generated samples")
+    extraction_parser.add_argument("--repeat", type=int, default=50)
+    extraction_parser.set_defaults(func=benchmark_extraction)
+
+    upload_parser = subparsers.add_parser("upload", help="Peak memory per request for file and base64 resume uploads")
+    upload_parser.add_argument("--sizes", type=int, nargs="*", default=[1, 10, 50], help="Upload sizes in MB")
+    upload_parser.add_argument("--limit-mb", type=int, default=10, help="RESUME_MAX_BYTES for the oversize case")
+    upload_parser.set_defaults(func=benchmark_upload)
+
+    history_parser = subparsers.add_parser("chat-history", help="Prompt tokens and latency vs chat length, full vs budgeted history")
+    history_parser.add_argument("--lengths", type=int, nargs="*", default=[4, 10, 20, 40, 80, 160])
+    history_parser.add_argument("--budget", type=int, default=1500, help="CHAT_HISTORY_BUDGET_TOKENS")
+    history_parser.add_argument("--block", type=int, default=4, help="CHAT_HISTORY_BLOCK_MESSAGES")
+    history_parser.add_argument("--live", action="store_true", help="Also time /api/chat on a running server")
+    history_parser.set_defaults(func=benchmark_chat_history)
+
+    match_parser = subparsers.add_parser("match-modes", help="Single-call vs two-call job matching (needs a running server)")
+    match_parser.add_argument("--requests", type=int, default=5)
+    match_parser.set_defaults(func=benchmark_match_modes)
+
+    skills_parser = subparsers.add_parser("skills", help="Per-pair latency of local skills matching")
+    skills_parser.add_argument("--pairs", type=int, default=10000)
+    skills_parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    skills_parser.set_defaults(func=benchmark_skills)
+
+    batching_parser = subparsers.add_parser("batching", help="Query encode throughput at 1/8/64 concurrent clients")
+    batching_parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 64])
+    batching_parser.add_argument("--window-ms", type=float, default=5.0)
+    batching_parser.add_argument("--max-batch", type=int, default=32)
+    batching_parser.add_argument("--workers", type=int, default=2)
+    batching_parser.add_argument("--duration", type=float, default=5.0)
+    batching_parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    batching_parser.set_defaults(func=benchmark_batching)
+
+    args = parser.parse_args()
+    result = args.func(args)
+    if asyncio.iscoroutine(result):
+        asyncio.run(result)
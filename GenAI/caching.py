@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+_MISSING = object()
+
+class TTLCache:
+    """Bounded LRU cache with an optional per-entry time-to-live and hit/miss counters"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+# ==================== Gemini Response Cache ====================
+
+def response_fingerprint(model: str, prompt: str, attachment: Optional[bytes] = None, config: Optional[str] = None) -> str:
+    """Content address of a generate_content call"""
+    digest = hashlib.sha256()
+    for part in (model, prompt, config or ""):
+        encoded = part.encode('utf-8')
+        digest.update(len(encoded).to_bytes(8, 'big'))
+        digest.update(encoded)
+    if attachment is not None:
+        digest.update(len(attachment).to_bytes(8, 'big'))
+        digest.update(attachment)
+    return digest.hexdigest()
+
+class SQLiteResponseStore:
+    """Persistent response tier in a single SQLite file"""
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5.0)
+
+    def get(self, key: str) -> Any:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= time.time():
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float]):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl if ttl else None, now)
+            )
+            conn.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+class DirectoryResponseStore:
+    """Persistent response tier with one JSON file per response"""
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key: str) -> Any:
+        try:
+            with open(self._file(key), "r") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry["expires_at"] is not None and entry["expires_at"] <= time.time():
+            os.remove(self._file(key))
+            return None
+        # mtime doubles as the last-access time for eviction
+        os.utime(self._file(key))
+        return entry["value"]
+
+    def set(self, key: str, value: Any, ttl: Optional[float]):
+        tmp_path = self._file(key) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"expires_at": time.time() + ttl if ttl else None, "value": value}, f)
+        os.replace(tmp_path, self._file(key))
+
+        entries = [e for e in os.scandir(self.path) if e.name.endswith(".json")]
+        if len(entries) > self.max_entries:
+            entries.sort(key=lambda e: e.stat().st_mtime)
+            for entry in entries[:len(entries) - self.max_entries]:
+                os.remove(entry.path)
+
+class ResponseCache:
+    """In-memory LRU tier in front of an optional persistent tier"""
+
+    def __init__(self, memory: TTLCache, store=None, ttl: Optional[float] = None):
+        self.memory = memory
+        self.store = store
+        self.ttl = ttl
+        self.store_hits = 0
+
+    async def get(self, key: str) -> Any:
+        value = self.memory.get(key)
+        if value is not None or self.store is None:
+            return value
+        try:
+            value = await asyncio.to_thread(self.store.get, key)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: response cache read failed: {e}")
+            return None
+        if value is not None:
+            self.store_hits += 1
+            self.memory.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any):
+        self.memory.set(key, value)
+        if self.store is not None:
+            try:
+                await asyncio.to_thread(self.store.set, key, value, self.ttl)
+            except (OSError, sqlite3.Error, TypeError) as e:
+                print(f"Warning: response cache write failed: {e}")
+
+    def stats(self) -> dict:
+        stats = self.memory.stats()
+        stats["store_hits"] = self.store_hits
+        stats["store"] = type(self.store).__name__ if self.store else None
+        return stats
+
+def create_response_cache(spec: str, ttl: Optional[float] = None, memory_size: int = 512,
+                          max_entries: int = 10000) -> Optional[ResponseCache]:
+    """
+    Build a response cache from a spec string.
+
+    "off" disables caching, "memory" keeps only the in-process tier, and
+    "sqlite:<path>" or "dir:<path>" add a persistent tier.
+    """
+    if not spec or spec == "off":
+        return None
+    memory = TTLCache(maxsize=memory_size, ttl=ttl)
+    if spec == "memory":
+        return ResponseCache(memory, ttl=ttl)
+    kind, _, path = spec.partition(":")
+    if kind == "sqlite":
+        return ResponseCache(memory, SQLiteResponseStore(path or "gemini_cache.sqlite3", max_entries), ttl)
+    if kind == "dir":
+        return ResponseCache(memory, DirectoryResponseStore(path or "gemini_cache", max_entries), ttl)
+    raise ValueError(f"Unknown GEMINI_CACHE setting: {spec}")
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one in-flight call"""
+
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, fn):
+        """Await fn() once per key; callers arriving while it runs get the same result"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A cancelled caller must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "upstream_calls": self.calls,
+            "coalesced_calls": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,85 @@
+import sys
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from vector_index import normalize_rows, top_k
+
+class CandidateIndex:
+    """
+    In-process index of job-seeker profile embeddings.
+
+    Vectors live in one growable, pre-normalized float32 matrix so a search is
+    a single matrix-vector product. Profiles are upserted and removed in place
+    (removal swaps the last row into the freed slot), so no rebuild is needed.
+    """
+
+    def __init__(self, dim: int, initial_capacity: int = 1024):
+        self.dim = dim
+        self._vectors = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._summaries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def upsert(self, profile_id: str, vector: np.ndarray, summary: Optional[dict] = None):
+        """Add a profile or replace its embedding"""
+        vector = normalize_rows(vector)[0]
+        with self._lock:
+            row = self._rows.get(profile_id)
+            if row is None:
+                row = len(self._ids)
+                if row == self._vectors.shape[0]:
+                    grown = np.zeros((max(1, row * 2), self.dim), dtype=np.float32)
+                    grown[:row] = self._vectors
+                    self._vectors = grown
+                self._ids.append(profile_id)
+                self._rows[profile_id] = row
+            self._vectors[row] = vector
+            self._summaries[profile_id] = summary or {}
+
+    def remove(self, profile_id: str) -> bool:
+        """Drop a profile; returns False if it wasn't indexed"""
+        with self._lock:
+            row = self._rows.pop(profile_id, None)
+            if row is None:
+                return False
+            last = len(self._ids) - 1
+            if row != last:
+                moved_id = self._ids[last]
+                self._vectors[row] = self._vectors[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+            self._ids.pop()
+            del self._summaries[profile_id]
+            return True
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float, dict]]:
+        """The k most similar profiles as (profile_id, cosine score, summary)"""
+        with self._lock:
+            size = len(self._ids)
+            if size == 0:
+                return []
+            scores = self._vectors[:size] @ normalize_rows(query)[0]
+            best = top_k(scores, k)
+            return [(self._ids[i], float(scores[i]), self._summaries[self._ids[i]]) for i in best.tolist()]
+
+    def stats(self) -> dict:
+        """Size and memory use, including the per-profile average"""
+        with self._lock:
+            size = len(self._ids)
+            vector_bytes = self._vectors.nbytes
+            metadata_bytes = sum(
+                sys.getsizeof(profile_id) + sum(sys.getsizeof(v) for v in summary.values())
+                for profile_id, summary in self._summaries.items()
+            )
+            return {
+                "profiles": size,
+                "capacity": self._vectors.shape[0],
+                "vector_bytes": vector_bytes,
+                "metadata_bytes": metadata_bytes,
+                "bytes_per_profile": (vector_bytes + metadata_bytes) / size if size else 0.0,
+                "vector_bytes_per_profile": self.dim * 4,
+            }
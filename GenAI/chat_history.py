@@ -0,0 +1,128 @@
+import hashlib
+from typing import Awaitable, Callable, List, Optional, Tuple
+from caching import TTLCache
+
+# summarize(previous_summary, turns) -> new summary, or None if it couldn't be made
+Summarizer = Callable[[Optional[str], List[str]], Awaitable[Optional[str]]]
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: about four characters per token for English text"""
+    return (len(text) + 3) // 4
+
+def format_turn(message: dict) -> str:
+    """One history message as a "Role: content" prompt line"""
+    return f"{message.get('role', 'user').capitalize()}: {message.get('content', '')}"
+
+class ChatHistoryManager:
+    """
+    Fits chat history into a token budget: recent turns verbatim, older ones summarized.
+
+    Once the history passes budget_tokens, turns are aged out oldest first in
+    blocks of block_messages until the verbatim remainder plus summary_tokens
+    (room reserved for the summary) fits the budget. The last keep_recent
+    messages are always kept, so only a few very long recent messages can
+    push the history over budget. Each aged prefix's summary is cached under
+    a hash chain over its blocks, so it is generated once and reused while
+    the conversation grows. A longer prefix is summarized by folding only the
+    newly aged turns into the longest cached summary before it. If that
+    summary can't be made, the longest cached one is sent instead, followed
+    by as many of the turns it doesn't cover, oldest first, as the budget allows.
+    """
+
+    def __init__(self, summarize: Summarizer, budget_tokens: int = 1500, block_messages: int = 4,
+                 keep_recent: int = 2, summary_tokens: int = 250, cache_size: int = 4096,
+                 ttl: Optional[float] = 86400):
+        self.summarize = summarize
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self.block_messages = max(1, block_messages)
+        self.keep_recent = keep_recent
+        self.summaries = TTLCache(maxsize=cache_size, ttl=ttl)
+        self.requests = 0
+        self.compacted = 0
+        self.summary_calls = 0
+        self.summary_failures = 0
+        self.history_tokens = 0
+        self.sent_tokens = 0
+
+    async def compact(self, history: List[dict]) -> Tuple[Optional[str], List[str]]:
+        """(summary of the aged-out turns or None, formatted turns to send verbatim)"""
+        turns = [format_turn(message) for message in history]
+        tokens = [estimate_tokens(turn) for turn in turns]
+        remaining = sum(tokens)
+        self.requests += 1
+        self.history_tokens += remaining
+
+        split = 0
+        target = self.budget_tokens - self.summary_tokens if remaining > self.budget_tokens else remaining
+        while remaining > target and split + self.block_messages <= len(turns) - self.keep_recent:
+            remaining -= sum(tokens[split:split + self.block_messages])
+            split += self.block_messages
+        if split == 0:
+            self.sent_tokens += remaining
+            return None, turns
+
+        self.compacted += 1
+        summary, covered = await self._summary(turns, split)
+        summary_tokens = estimate_tokens(summary) if summary else 0
+        kept = []
+        if covered < split:
+            # Keep the oldest uncovered turns, where background and accommodation needs usually are
+            room = self.budget_tokens - remaining - summary_tokens
+            for turn, count in zip(turns[covered:split], tokens[covered:split]):
+                if count > room:
+                    if room > 0:
+                        kept.append(turn[:room * 4])
+                        remaining += room
+                    break
+                kept.append(turn)
+                remaining += count
+                room -= count
+        self.sent_tokens += remaining + summary_tokens
+        return summary, kept + turns[split:]
+
+    async def _summary(self, turns: List[str], split: int) -> Tuple[Optional[str], int]:
+        """(summary, number of leading turns it covers); covers fewer than split if summarizing failed"""
+        # keys[i] identifies the first i + 1 blocks; hexdigest() leaves the running hash usable
+        keys = []
+        digest = hashlib.sha256()
+        for start in range(0, split, self.block_messages):
+            for turn in turns[start:start + self.block_messages]:
+                encoded = turn.encode('utf-8')
+                digest.update(len(encoded).to_bytes(8, 'big'))
+                digest.update(encoded)
+            keys.append(digest.hexdigest())
+
+        summary = self.summaries.get(keys[-1])
+        if summary is not None:
+            return summary, split
+
+        previous, start = None, 0
+        for index in range(len(keys) - 2, -1, -1):
+            previous = self.summaries.get(keys[index])
+            if previous is not None:
+                start = (index + 1) * self.block_messages
+                break
+
+        self.summary_calls += 1
+        summary = await self.summarize(previous, turns[start:split])
+        if summary is None:
+            # Fall back to the cached summary before this prefix; the next turn tries again
+            self.summary_failures += 1
+            return previous, start
+        self.summaries.set(keys[-1], summary)
+        return summary, split
+
+    def stats(self) -> dict:
+        return {
+            "budget_tokens": self.budget_tokens,
+            "block_messages": self.block_messages,
+            "requests": self.requests,
+            "compacted": self.compacted,
+            "summary_calls": self.summary_calls,
+            "summary_failures": self.summary_failures,
+            "summary_cache": self.summaries.stats(),
+            "history_tokens": self.history_tokens,
+            "sent_tokens": self.sent_tokens,
+            "token_reduction": 1 - self.sent_tokens / self.history_tokens if self.history_tokens else 0.0,
+        }
@@ -0,0 +1,175 @@
+import os
+import json
+import mmap
+import struct
+import hashlib
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Optional
+from embeddings import course_text, catalog_fingerprint, load_course_embeddings, remove_stale_artifacts
+
+# Bump whenever the binary layout changes so stale stores are rebuilt
+COURSE_STORE_VERSION = 1
+COURSE_STORE_MAGIC = b"COURSES\0"
+
+# Per-course text fields, in the order they are laid out in the store
+COURSE_FIELDS = ("course_id", "course_name", "abstract", "instructor", "course_url", "skills")
+
+# magic, version, dim, count, embeddings offset, field offsets offset, text offset, catalog fingerprint
+_HEADER = struct.Struct("<8sIIQQQQ64s")
+_ALIGNMENT = 64
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+class CourseStore:
+    """
+    Read-only course catalog in a single binary file.
+
+    Layout: a fixed header, a float32 embeddings block (rows unit-length), a
+    uint64 table of field offsets and a UTF-8 text block. The file is
+    memory-mapped, so every worker shares the same physical pages and opening
+    it parses nothing. Course fields are decoded only when asked for.
+    """
+
+    def __init__(self, buffer, path: Optional[str] = None):
+        self.path = path
+        self._buffer = buffer
+        magic, version, dim, count, embeddings_offset, offsets_offset, text_offset, fingerprint = \
+            _HEADER.unpack_from(buffer, 0)
+        if magic != COURSE_STORE_MAGIC or version != COURSE_STORE_VERSION:
+            raise ValueError(f"Not a v{COURSE_STORE_VERSION} course store")
+        self.fingerprint = fingerprint.decode('ascii')
+        self.embeddings = np.frombuffer(buffer, dtype=np.float32, count=count * dim,
+                                        offset=embeddings_offset).reshape(count, dim)
+        self._offsets = np.frombuffer(buffer, dtype=np.uint64, count=count * len(COURSE_FIELDS) + 1,
+                                      offset=offsets_offset)
+        self._text_offset = text_offset
+
+    @classmethod
+    def open(cls, path: str) -> "CourseStore":
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, path)
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    def field(self, index: int, name: str) -> str:
+        """One text field of a course, decoded from the mapped text block"""
+        slot = index * len(COURSE_FIELDS) + COURSE_FIELDS.index(name)
+        start = self._text_offset + int(self._offsets[slot])
+        end = self._text_offset + int(self._offsets[slot + 1])
+        return bytes(self._buffer[start:end]).decode('utf-8')
+
+    def skills(self, index: int) -> List[str]:
+        """Canonical skills tagged on the course when the store was compiled"""
+        skills = self.field(index, "skills")
+        return skills.split("\n") if skills else []
+
+@dataclass
+class CourseCatalog:
+    """Everything a recommendation reads, swapped as one object on reload"""
+    store: CourseStore
+    index: Optional[object]
+
+    @property
+    def version(self) -> str:
+        # Changes whenever the embedding model or any course text changes
+        return self.store.fingerprint
+
+def write_course_store(path: str, courses: List[dict], embeddings: np.ndarray, skills: List[List[str]],
+                       fingerprint: str):
+    """Compile courses, their embeddings and tagged skills into a store file, atomically"""
+    count = len(courses)
+    dim = embeddings.shape[1] if count else 0
+
+    text = bytearray()
+    offsets = np.zeros(count * len(COURSE_FIELDS) + 1, dtype=np.uint64)
+    slot = 0
+    for index, course in enumerate(courses):
+        values = {
+            "course_id": str(course.get('course_id', index)),
+            "course_name": course['course_name'],
+            "abstract": course.get('abstract') or '',
+            "instructor": course.get('instructor') or '',
+            "course_url": course.get('course_url') or '',
+            "skills": "\n".join(skills[index]),
+        }
+        for name in COURSE_FIELDS:
+            text += values[name].encode('utf-8')
+            slot += 1
+            offsets[slot] = len(text)
+
+    embeddings_offset = _align(_HEADER.size)
+    offsets_offset = _align(embeddings_offset + count * dim * 4)
+    text_offset = _align(offsets_offset + offsets.nbytes)
+    header = _HEADER.pack(COURSE_STORE_MAGIC, COURSE_STORE_VERSION, dim, count, embeddings_offset,
+                          offsets_offset, text_offset, fingerprint.encode('ascii'))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.seek(embeddings_offset)
+        for start in range(0, count, 4096):
+            block = np.asarray(embeddings[start:start + 4096], dtype=np.float32)
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            f.write((block / norms).astype(np.float32).tobytes())
+        f.seek(offsets_offset)
+        f.write(offsets.tobytes())
+        f.seek(text_offset)
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _store_prefix(model_name: str) -> str:
+    return f"course_store-v{COURSE_STORE_VERSION}-{model_name.replace('/', '__')}-"
+
+def course_store_path(cache_dir: str, model_name: str, source_key: str) -> str:
+    return os.path.join(cache_dir, f"{_store_prefix(model_name)}{source_key[:16]}.bin")
+
+def load_course_store(courses_path: str, get_model, model_name: str, cache_dir: str, taxonomy,
+                      stats: Optional[dict] = None) -> CourseStore:
+    """
+    Map the compiled store for courses_path, compiling it first if needed.
+
+    Stores are keyed by the raw bytes of the courses file, the model and the
+    skills taxonomy, so a worker that finds one only hashes the file and never
+    calls get_model(). Compiling reuses the embeddings artifact and loads the
+    model only to encode new or changed courses; the reused and encoded
+    counts go into stats when it is given.
+    """
+    if stats is not None:
+        stats.update(reused=0, encoded=0)
+    try:
+        with open(courses_path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        print(f"Warning: {courses_path} not found, using empty courses list")
+        raw = b"[]"
+
+    digest = hashlib.sha256(raw)
+    digest.update(model_name.encode('utf-8'))
+    digest.update(taxonomy.fingerprint.encode('ascii'))
+    path = course_store_path(cache_dir, model_name, digest.hexdigest())
+    try:
+        store = CourseStore.open(path)
+        if stats is not None:
+            stats["reused"] = len(store)
+        return store
+    except FileNotFoundError:
+        pass
+    except (ValueError, OSError, struct.error) as e:
+        print(f"Warning: rebuilding unreadable course store: {e}")
+
+    courses = json.loads(raw)
+    texts = [course_text(course) for course in courses]
+    embeddings = load_course_embeddings(texts, get_model, model_name, cache_dir, stats)
+    skills = [taxonomy.find(text) for text in texts]
+    write_course_store(path, courses, embeddings, skills, catalog_fingerprint(texts, model_name))
+    print(f"Compiled course store with {len(courses)} courses at {path}")
+
+    # Older stores for this model are dead weight now
+    remove_stale_artifacts(cache_dir, _store_prefix(model_name), ".bin", path)
+    return CourseStore.open(path)
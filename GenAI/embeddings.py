@@ -0,0 +1,291 @@
+import os
+import json
+import asyncio
+import hashlib
+import functools
+import multiprocessing
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Optional
+
+# Bump whenever the on-disk layout changes so stale artifacts are ignored
+EMBEDDINGS_CACHE_VERSION = 2
+
+def course_text(course: dict) -> str:
+    """Text that gets embedded for a course"""
+    # Combine name and abstract for better representation
+    return f"{course['course_name']} {course.get('abstract', '')}"
+
+def content_hash(text: str) -> str:
+    """Stable hash of the text fed to the embedding model"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def catalog_fingerprint(texts: List[str], model_name: str) -> str:
+    """Identifies a catalog's embeddings: changes with the model or any course text"""
+    digest = hashlib.sha256(model_name.encode('utf-8'))
+    for text in texts:
+        digest.update(content_hash(text).encode('ascii'))
+    return digest.hexdigest()
+
+def _artifact_paths(cache_dir: str, model_name: str):
+    """Prefix of the embeddings matrix files and path of the manifest for a given model"""
+    slug = model_name.replace('/', '__')
+    base = os.path.join(cache_dir, f"course_embeddings-v{EMBEDDINGS_CACHE_VERSION}-{slug}")
+    return base, base + ".json"
+
+def _matrix_path(base: str, model_name: str, hashes: List[str]) -> str:
+    """Matrix file named after the rows it holds, so a manifest can only point at its own matrix"""
+    digest = hashlib.sha256(model_name.encode('utf-8'))
+    for h in hashes:
+        digest.update(h.encode('ascii'))
+    return f"{base}-{digest.hexdigest()[:16]}.npy"
+
+def _read_artifact(base: str, manifest_path: str, model_name: str):
+    """Load a previously saved artifact, or (None, []) if it is missing or stale"""
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != EMBEDDINGS_CACHE_VERSION or manifest.get("model") != model_name:
+            return None, []
+        hashes = manifest["hashes"]
+        matrix_path = _matrix_path(base, model_name, hashes)
+        if manifest.get("matrix") != os.path.basename(matrix_path):
+            return None, []
+        matrix = np.load(matrix_path, mmap_mode='r')
+        if matrix.ndim != 2 or matrix.shape != (len(hashes), manifest["dim"]):
+            return None, []
+        return matrix, hashes
+    except (FileNotFoundError, ValueError, KeyError, OSError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Warning: ignoring unreadable embeddings cache: {e}")
+        return None, []
+
+def _write_artifact(base: str, manifest_path: str, model_name: str, matrix: np.ndarray, hashes: List[str]) -> str:
+    """
+    Atomically write the embeddings matrix, then the manifest naming it; returns the matrix path.
+
+    Temp files carry the pid so workers compiling at the same time never
+    write into each other's file. The matrix path is derived from its row
+    hashes and is never rewritten with other rows, so replacing the manifest
+    is the single commit point: readers see the old pair or the new one.
+    """
+    os.makedirs(os.path.dirname(base) or ".", exist_ok=True)
+    matrix_path = _matrix_path(base, model_name, hashes)
+    tmp_matrix = f"{matrix_path}.{os.getpid()}.tmp"
+    with open(tmp_matrix, "wb") as f:
+        np.save(f, matrix)
+    os.replace(tmp_matrix, matrix_path)
+
+    tmp_manifest = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_manifest, "w") as f:
+        json.dump({
+            "version": EMBEDDINGS_CACHE_VERSION,
+            "model": model_name,
+            "dim": int(matrix.shape[1]),
+            "matrix": os.path.basename(matrix_path),
+            "hashes": hashes
+        }, f)
+    os.replace(tmp_manifest, manifest_path)
+
+    # Matrices of older catalogs are dead weight now
+    remove_stale_artifacts(os.path.dirname(base) or ".", os.path.basename(base) + "-", ".npy", matrix_path)
+    return matrix_path
+
+def remove_stale_artifacts(directory: str, prefix: str, suffix: str, keep: str):
+    """
+    Delete the files named prefix + 16 hex digits + suffix in directory, except keep.
+
+    Only that exact shape matches, so the artifacts of another model whose
+    name merely extends this one are left alone. Files still memory-mapped
+    by a running worker stay valid for it until it closes them.
+    """
+    for name in os.listdir(directory):
+        key = name[len(prefix):-len(suffix)]
+        if (name.startswith(prefix) and name.endswith(suffix) and len(key) == 16
+                and all(c in "0123456789abcdef" for c in key) and name != os.path.basename(keep)):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+def load_course_embeddings(texts: List[str], get_model, model_name: str, cache_dir: str,
+                           stats: Optional[dict] = None) -> np.ndarray:
+    """
+    Return embeddings for texts, reusing the on-disk artifact for model_name.
+
+    Rows are matched by content hash, so only new or changed texts are encoded.
+    When nothing changed the matrix is memory-mapped straight from disk.
+    get_model() is only called when some text has to be encoded. If stats is
+    given, the "reused" and "encoded" row counts are stored in it.
+    """
+    if stats is not None:
+        stats.update(reused=0, encoded=0)
+    if not texts:
+        return np.array([])
+
+    hashes = [content_hash(text) for text in texts]
+    base, manifest_path = _artifact_paths(cache_dir, model_name)
+    cached_matrix, cached_hashes = _read_artifact(base, manifest_path, model_name)
+
+    if cached_matrix is not None and cached_hashes == hashes:
+        if stats is not None:
+            stats["reused"] = len(texts)
+        return cached_matrix
+
+    cached_rows = {h: i for i, h in enumerate(cached_hashes)}
+    missing = [i for i, h in enumerate(hashes) if h not in cached_rows]
+    if stats is not None:
+        stats.update(reused=len(texts) - len(missing), encoded=len(missing))
+
+    model = get_model() if missing else None
+    dim = cached_matrix.shape[1] if cached_matrix is not None else model.get_sentence_embedding_dimension()
+    matrix = np.empty((len(texts), dim), dtype=np.float32)
+    for i, h in enumerate(hashes):
+        if h in cached_rows:
+            matrix[i] = cached_matrix[cached_rows[h]]
+    if missing:
+        matrix[missing] = model.encode([texts[i] for i in missing])
+
+    print(f"Course embeddings: reused {len(texts) - len(missing)}, encoded {len(missing)}")
+
+    try:
+        matrix_path = _write_artifact(base, manifest_path, model_name, matrix, hashes)
+    except OSError as e:
+        print(f"Warning: could not write embeddings cache: {e}")
+        return matrix
+
+    # Serve from the mapped file so workers share pages instead of private copies
+    return np.load(matrix_path, mmap_mode='r')
+
+# ==================== Off-Loop Inference ====================
+
+# Model owned by a worker process when running with a process pool
+_process_model = None
+
+def _init_process_model(model_name: str):
+    """Load the embedding model once per worker process"""
+    global _process_model
+    from sentence_transformers import SentenceTransformer
+    _process_model = SentenceTransformer(model_name)
+
+def _encode_in_process(texts: List[str]) -> np.ndarray:
+    return _process_model.encode(texts)
+
+class EmbeddingWorkerPool:
+    """
+    Runs embedding inference and similarity search off the event loop.
+
+    kind="thread" shares the already loaded model across a thread pool (torch
+    and numpy release the GIL for the heavy parts). kind="process" gives every
+    worker process its own copy of the model; similarity search still runs on
+    threads so the course index is never copied between processes.
+    """
+
+    def __init__(self, model, model_name: str, kind: str = "thread", max_workers: int = 2, max_pending: int = 64):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown embedding executor: {kind}")
+        self.kind = kind
+        # May be None at construction and assigned once the model has loaded
+        self.model = model
+        self.max_pending = max_pending
+        self._pending = None
+        self.thread_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embedding")
+        if kind == "process":
+            self.encode_executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_model,
+                initargs=(model_name,)
+            )
+        else:
+            self.encode_executor = self.thread_executor
+
+    async def _submit(self, executor, fn, *args):
+        # Bound the work queued behind the executor so bursts wait here instead
+        if self._pending is None:
+            self._pending = asyncio.Semaphore(self.max_pending)
+        async with self._pending:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, functools.partial(fn, *args))
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts without blocking the event loop"""
+        if self.kind == "process":
+            return await self._submit(self.encode_executor, _encode_in_process, list(texts))
+        return await self._submit(self.encode_executor, self.model.encode, list(texts))
+
+    async def run(self, fn, *args):
+        """Run a CPU-bound function (e.g. an index search) on the thread pool"""
+        return await self._submit(self.thread_executor, fn, *args)
+
+    def shutdown(self):
+        self.thread_executor.shutdown(wait=False)
+        if self.encode_executor is not self.thread_executor:
+            self.encode_executor.shutdown(wait=False)
+
+class QueryBatcher:
+    """
+    Coalesces query texts from concurrent requests into one forward pass.
+
+    A batch is flushed when max_batch texts are waiting or window_ms after the
+    first one arrived, whichever comes first. Each caller gets its own vector.
+    """
+
+    def __init__(self, pool: EmbeddingWorkerPool, window_ms: float = 5.0, max_batch: int = 32):
+        self.pool = pool
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._waiting = []
+        self._timer = None
+        # The loop only holds weak references to tasks; these must live until every caller is answered
+        self._tasks = set()
+        self.batches = 0
+        self.queries = 0
+        self.largest_batch = 0
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Embedding for a single query text"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiting.append((text, future))
+        if len(self._waiting) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._waiting = self._waiting, []
+        if batch:
+            task = asyncio.ensure_future(self._encode_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _encode_batch(self, batch):
+        # Identical texts in one window share a row
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.queries += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            vectors = await self.pool.encode(texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        rows = {text: i for i, text in enumerate(texts)}
+        for text, future in batch:
+            if not future.done():
+                future.set_result(vectors[rows[text]])
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch_size": self.queries / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+        }
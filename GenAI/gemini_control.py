@@ -0,0 +1,275 @@
+import os
+import json
+import math
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
+from typing import Optional
+
+# Lower numbers are admitted first when calls are queued
+ENDPOINT_PRIORITIES = {
+    "chat": 0,
+    "chat_summary": 0,
+    "resume": 1,
+    "match": 2,
+    "default": 1,
+}
+
+class UpstreamBusyError(Exception):
+    """Raised when a Gemini call can't get a concurrency slot in time"""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class PriorityLimiter:
+    """
+    Caps concurrent upstream calls behind a bounded, prioritized wait queue.
+
+    Callers beyond max_concurrent wait in priority order. When max_queue
+    callers are already waiting, a new caller evicts the newest waiter of a
+    lower priority (lower number wins), which then gets a 429. If no such
+    waiter exists, the new caller is rejected at once (429). Callers that
+    wait longer than max_wait seconds give up (503).
+    """
+
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 64, max_wait: float = 10.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._active = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._avg_call_seconds = 1.0
+        self.admitted = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.timed_out = 0
+        self.peak_queue = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up, for the Retry-After header"""
+        rounds = (self.queued + 1) / max(1, self.max_concurrent)
+        return max(1, math.ceil(rounds * self._avg_call_seconds))
+
+    async def acquire(self, priority: int):
+        if self._active < self.max_concurrent and not self.queued:
+            self._active += 1
+            self.admitted += 1
+            return
+
+        if self.queued >= self.max_queue and not self._evict_below(priority):
+            self.rejected += 1
+            raise UpstreamBusyError("Too many pending AI requests, try again later", 429, self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self.peak_queue = max(self.peak_queue, self.queued)
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise UpstreamBusyError("AI service is busy, try again later", 503, self.retry_after())
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before we were cancelled
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        self.admitted += 1
+
+    def _evict_below(self, priority: int) -> bool:
+        """Fail the newest waiter with a worse priority than `priority` to make room; False if there is none"""
+        live = [entry for entry in self._waiters if not entry[2].done()]
+        if not live:
+            return False
+        worst_priority, _, future = max(live, key=lambda entry: (entry[0], entry[1]))
+        if worst_priority <= priority:
+            return False
+        future.set_exception(UpstreamBusyError(
+            "AI service is busy with higher-priority requests, try again later", 429, self.retry_after()
+        ))
+        self.evicted += 1
+        return True
+
+    def release(self, elapsed: float = None):
+        if elapsed is not None:
+            self._avg_call_seconds = 0.9 * self._avg_call_seconds + 0.1 * elapsed
+        # Hand the slot straight to the best waiter that is still waiting
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int):
+        await self.acquire(priority)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "timed_out": self.timed_out,
+            "peak_queue": self.peak_queue,
+        }
+
+# ==================== Retries and Hedging ====================
+
+# HTTP statuses worth another attempt: timeouts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    attempt_timeout: float = 30.0
+    deadline: float = 60.0
+    hedge: bool = False
+    hedge_percentile: float = 95.0
+
+def retry_policy_from_env(endpoint: str, default: RetryPolicy) -> RetryPolicy:
+    """Apply overrides from GEMINI_RETRY_<ENDPOINT>, e.g. '{"max_attempts": 2, "hedge": true}'"""
+    overrides = os.environ.get(f"GEMINI_RETRY_{endpoint.upper()}")
+    return replace(default, **json.loads(overrides)) if overrides else default
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether a failed attempt might succeed if repeated"""
+    if isinstance(exc, UpstreamBusyError):
+        return False
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    # google-genai APIError carries the HTTP status as .code
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS_CODES
+    # Transport failures from the underlying httpx client
+    return type(exc).__module__.startswith("httpx") and "Error" in type(exc).__name__
+
+class LatencyTracker:
+    """Sliding window of recent call durations"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q-th percentile in seconds, or None until enough samples were seen"""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+class RetryingCaller:
+    """
+    Runs an upstream call with per-attempt timeouts, an overall deadline,
+    capped exponential backoff with full jitter, and optional hedging.
+
+    With hedging on, an attempt that hasn't answered within the observed
+    hedge_percentile latency gets a duplicate request; whichever finishes
+    first wins and the other is cancelled.
+    """
+
+    def __init__(self, policy: RetryPolicy):
+        self.policy = policy
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+    async def call(self, attempt_fn):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.policy.deadline
+        self.calls += 1
+        for attempt in range(1, self.policy.max_attempts + 1):
+            timeout = min(self.policy.attempt_timeout, deadline - loop.time())
+            try:
+                if timeout <= 0:
+                    raise asyncio.TimeoutError("Deadline exceeded before the attempt started")
+                return await self._attempt(attempt_fn, timeout)
+            except Exception as e:
+                delay = random.uniform(0, min(self.policy.max_delay, self.policy.base_delay * 2 ** (attempt - 1)))
+                last_attempt = attempt == self.policy.max_attempts or loop.time() + delay >= deadline
+                if last_attempt or not is_retryable(e):
+                    self.failures += 1
+                    raise
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def _timed(self, attempt_fn):
+        start = time.monotonic()
+        result = await attempt_fn()
+        self.latency.record(time.monotonic() - start)
+        return result
+
+    async def _attempt(self, attempt_fn, timeout: float):
+        hedge_after = self.latency.percentile(self.policy.hedge_percentile) if self.policy.hedge else None
+        if hedge_after is None or hedge_after >= timeout:
+            return await asyncio.wait_for(self._timed(attempt_fn), timeout)
+
+        loop = asyncio.get_running_loop()
+        ends_at = loop.time() + timeout
+        primary = asyncio.ensure_future(self._timed(attempt_fn))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_after)
+            if not done:
+                self.hedges += 1
+                pending.add(asyncio.ensure_future(self._timed(attempt_fn)))
+
+            error = None
+            while done or pending:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, ends_at - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError("Attempt timed out")
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        p95 = self.latency.percentile(95)
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failures": self.failures,
+            "p95_ms": p95 * 1000 if p95 is not None else None,
+        }
@@ -0,0 +1,127 @@
+import time
+import asyncio
+import hashlib
+import zipfile
+from typing import AsyncIterator, Optional, Tuple
+from uploads import UploadTooLargeError, read_upload
+
+def _skipped_member(info: zipfile.ZipInfo) -> bool:
+    # Directories, macOS resource forks and hidden files are never resumes
+    return info.is_dir() or info.filename.startswith("__MACOSX/") or info.filename.rsplit("/", 1)[-1].startswith(".")
+
+# ==================== Sources ====================
+
+def _is_archive(fileobj) -> bool:
+    """A zip of resumes, as opposed to a single DOCX (which is also a zip)"""
+    fileobj.seek(0)
+    head = fileobj.read(4096)
+    fileobj.seek(0)
+    if not head.startswith(b"PK\x03\x04"):
+        return False
+    try:
+        with zipfile.ZipFile(fileobj) as archive:
+            return "word/document.xml" not in archive.namelist()
+    except zipfile.BadZipFile:
+        return False
+    finally:
+        fileobj.seek(0)
+
+def _read_limited(fileobj, max_bytes: int) -> Optional[bytes]:
+    data = fileobj.read(max_bytes + 1)
+    return data if len(data) <= max_bytes else None
+
+def _archive_members(fileobj):
+    archive = zipfile.ZipFile(fileobj)
+    members = [info for info in archive.infolist() if not _skipped_member(info)]
+    return archive, members
+
+def _read_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, max_bytes: int) -> Optional[bytes]:
+    # file_size comes from the archive and can lie, so the read is capped as well
+    if info.file_size > max_bytes:
+        return None
+    with archive.open(info) as member:
+        return _read_limited(member, max_bytes)
+
+async def iter_resume_files(uploads, max_bytes: int) -> AsyncIterator[Tuple[str, Optional[bytes]]]:
+    """
+    Yield (name, contents) for every resume in the uploads, one at a time.
+
+    Zip archives are expanded member by member, straight from the spooled
+    upload, so only the file being handed out is in memory. contents is None
+    for files larger than max_bytes.
+    """
+    for upload in uploads:
+        if await asyncio.to_thread(_is_archive, upload.file):
+            archive, members = await asyncio.to_thread(_archive_members, upload.file)
+            with archive:
+                for info in members:
+                    contents = await asyncio.to_thread(_read_member, archive, info, max_bytes)
+                    yield f"{upload.filename}/{info.filename}", contents
+        else:
+            try:
+                contents = await asyncio.to_thread(read_upload, upload.file, max_bytes)
+            except UploadTooLargeError:
+                contents = None
+            yield upload.filename or "resume", contents
+
+# ==================== Ingestion ====================
+
+def bulk_record_id(run_id: str, digest: str) -> str:
+    """Bulk store key for one file of a bulk run"""
+    return f"bulk:{run_id}:{digest}"
+
+async def ingest_resumes(files: AsyncIterator[Tuple[str, Optional[bytes]]], parse, store, run_id: str,
+                         concurrency: int = 4, max_bytes: Optional[int] = None) -> AsyncIterator[dict]:
+    """
+    Parse files with at most `concurrency` in flight, yielding results as they finish.
+
+    Each file's outcome is saved in store under its run id and content hash.
+    Running the same run id again replays files that already succeeded
+    (marked "resumed") without parsing them, and retries the ones that
+    failed or never finished. Files are only read from `files` when a slot
+    is free, so memory stays bounded by `concurrency`, not by the batch.
+    """
+    async def process(name: str, contents: Optional[bytes]) -> dict:
+        if contents is None:
+            return {"file": name, "sha256": None, "status": "failed", "resumed": False, "result": None,
+                    "error": f"File exceeds {max_bytes} bytes"}
+        digest = hashlib.sha256(contents).hexdigest()
+        record_id = bulk_record_id(run_id, digest)
+        record = await asyncio.to_thread(store.get, record_id)
+        if record is not None and record["status"] == "done":
+            return {"file": name, "sha256": digest, "status": "done", "resumed": True, "result": record["result"]}
+
+        record = {"job_id": record_id, "status": "done", "result": None, "error": None}
+        try:
+            record["result"] = await parse(contents, name)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            record.update(status="failed", error=getattr(e, "detail", None) or str(e) or type(e).__name__)
+        record["finished_at"] = time.time()
+        await asyncio.to_thread(store.put, record)
+        return {"file": name, "sha256": digest, "status": record["status"], "resumed": False,
+                "result": record["result"], "error": record["error"]}
+
+    pending = set()
+    files = files.__aiter__()
+    try:
+        while True:
+            # Wait for a free slot before pulling the next file, so at most `concurrency` are held
+            while len(pending) >= concurrency:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    yield task.result()
+            try:
+                name, contents = await files.__anext__()
+            except StopAsyncIteration:
+                break
+            pending.add(asyncio.ensure_future(process(name, contents)))
+        while pending:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                yield task.result()
+    finally:
+        # Unfinished files have no record yet, so a rerun of the run picks them up
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,270 @@
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+import sqlite3
+import ipaddress
+from typing import Any, Optional, Sequence
+from urllib.parse import urlsplit
+from caching import TTLCache
+from gemini_control import LatencyTracker
+
+# ==================== Job Stores ====================
+
+class MemoryJobStore:
+    """Job records in an in-process LRU; finished jobs expire after ttl seconds"""
+
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = 86400):
+        self.records = TTLCache(maxsize=max_entries, ttl=ttl)
+
+    def put(self, record: dict):
+        self.records.set(record["job_id"], record)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        record = self.records.get(job_id)
+        return dict(record) if record is not None else None
+
+class SQLiteJobStore:
+    """Job records in a SQLite file, so results survive restarts and are shared by workers"""
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: Optional[float] = 86400, table: str = "resume_jobs"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid job store table name: {table}")
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.table = table
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "job_id TEXT PRIMARY KEY, record TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5.0)
+
+    def put(self, record: dict):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (job_id, record, updated_at) VALUES (?, ?, ?)",
+                (record["job_id"], json.dumps(record), now)
+            )
+            if self.ttl:
+                conn.execute(f"DELETE FROM {self.table} WHERE updated_at <= ?", (now - self.ttl,))
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE job_id IN ("
+                f"SELECT job_id FROM {self.table} ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT record FROM {self.table} WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+def create_job_store(spec: str, max_entries: int = 10000, ttl: Optional[float] = 86400, table: str = "resume_jobs"):
+    """Build a job store from a spec string: "memory" or "sqlite:<path>"; stores sharing a file use separate tables"""
+    if not spec or spec == "memory":
+        return MemoryJobStore(max_entries, ttl)
+    kind, _, path = spec.partition(":")
+    if kind == "sqlite":
+        return SQLiteJobStore(path or "resume_jobs.sqlite3", max_entries, ttl, table)
+    raise ValueError(f"Unknown RESUME_JOB_STORE setting: {spec}")
+
+# ==================== Webhooks ====================
+
+def check_webhook_url(url: str, allowed_hosts: Sequence[str] = ()):
+    """
+    Raise ValueError unless url is an http(s) URL whose host resolves only to public addresses.
+
+    With allowed_hosts set, the host must also be one of them or a subdomain
+    of one. This keeps client-supplied webhooks from reaching loopback,
+    private, link-local (cloud metadata) or other internal addresses.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("webhook_url must be an http or https URL")
+    host = parts.hostname.lower().rstrip(".")
+    if allowed_hosts and not any(host == allowed or host.endswith("." + allowed) for allowed in allowed_hosts):
+        raise ValueError("webhook_url host is not in the allowed webhook hosts")
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (OSError, ValueError) as e:
+        raise ValueError(f"webhook_url host can't be resolved: {e}")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global:
+            raise ValueError("webhook_url must not point to a private, loopback or link-local address")
+
+# ==================== Job Queue ====================
+
+class ResumeJobQueue:
+    """
+    Bounded queue of background jobs drained by a fixed number of async workers.
+
+    submit() stores a "queued" record and returns its id at once; a worker
+    later runs handler(payload), stores the result or error, and POSTs the
+    final record to the job's webhook_url if one was given. When max_queue
+    jobs are already waiting, or their payloads would pass max_queued_bytes,
+    submit() raises asyncio.QueueFull. Webhook URLs are checked with
+    check_webhook_url() on submit and again before each POST.
+    """
+
+    def __init__(self, handler, store, workers: int = 4, max_queue: int = 1000,
+                 max_queued_bytes: int = 256 * 1024 * 1024, webhook_timeout: float = 10.0,
+                 webhook_hosts: Sequence[str] = ()):
+        self.handler = handler
+        self.store = store
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_queued_bytes = max_queued_bytes
+        self.webhook_timeout = webhook_timeout
+        self.webhook_hosts = tuple(host.lower().rstrip(".") for host in webhook_hosts if host)
+        self._queue = None
+        self._reserved = 0
+        self._reserved_bytes = 0
+        self.queued_bytes = 0
+        self._tasks = []
+        self.running = 0
+        self.peak_queue = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.webhook_failures = 0
+        self.store_failures = 0
+        self.wait_time = LatencyTracker(window=1000, min_samples=1)
+        self.processing_time = LatencyTracker(window=1000, min_samples=1)
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+
+    async def submit(self, payload: Any, webhook_url: Optional[str] = None, size: int = 0) -> dict:
+        """Queue payload (size bytes) for the handler; raises ValueError for a rejected webhook_url"""
+        if webhook_url:
+            await asyncio.to_thread(check_webhook_url, webhook_url, self.webhook_hosts)
+        # Reserve the slot before awaiting the store so concurrent submits can't overfill
+        if self._queue.qsize() + self._reserved >= self.max_queue:
+            raise asyncio.QueueFull()
+        if self.queued_bytes + self._reserved_bytes + size > self.max_queued_bytes:
+            raise asyncio.QueueFull()
+        self._reserved += 1
+        self._reserved_bytes += size
+        record = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "webhook_url": webhook_url,
+        }
+        try:
+            # Stored before it is queued, so a worker's "running" update always lands last
+            await asyncio.to_thread(self.store.put, dict(record))
+        finally:
+            self._reserved -= 1
+            self._reserved_bytes -= size
+        self.queued_bytes += size
+        self._queue.put_nowait((record, payload, size))
+        self.submitted += 1
+        self.peak_queue = max(self.peak_queue, self._queue.qsize())
+        return record
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def _worker(self):
+        while True:
+            record, payload, size = await self._queue.get()
+            self.queued_bytes -= size
+            self.running += 1
+            try:
+                await self._run(record, payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A worker that dies here is never replaced, so keep draining the queue
+                print(f"Warning: resume job {record['job_id']} crashed its worker: {e!r}")
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+
+    async def _run(self, record: dict, payload: Any):
+        record.update(status="running", started_at=time.time())
+        self.wait_time.record(record["started_at"] - record["submitted_at"])
+        await self._save(record)
+        try:
+            record.update(status="done", result=await self.handler(payload))
+            self.completed += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            record.update(status="failed", error=getattr(e, "detail", None) or str(e) or type(e).__name__)
+            self.failed += 1
+        record["finished_at"] = time.time()
+        self.processing_time.record(record["finished_at"] - record["started_at"])
+        await self._save(record)
+        if record["webhook_url"]:
+            await self._notify(record)
+
+    async def _save(self, record: dict):
+        # Best effort: a locked or unavailable store must not strand the job or its webhook
+        try:
+            await asyncio.to_thread(self.store.put, dict(record))
+        except Exception as e:
+            self.store_failures += 1
+            print(f"Warning: resume job {record['job_id']} could not be stored as {record['status']}: {e}")
+
+    async def _notify(self, record: dict):
+        import httpx
+        try:
+            # Resolved again in case the host's DNS changed since submit; redirects are not followed
+            await asyncio.to_thread(check_webhook_url, record["webhook_url"], self.webhook_hosts)
+        except ValueError as e:
+            self.webhook_failures += 1
+            print(f"Warning: resume job webhook refused for {record['job_id']}: {e}")
+            return
+        try:
+            async with httpx.AsyncClient(timeout=self.webhook_timeout, follow_redirects=False) as client:
+                response = await client.post(record["webhook_url"], json=record)
+                response.raise_for_status()
+        except httpx.HTTPError as e:
+            self.webhook_failures += 1
+            print(f"Warning: resume job webhook failed for {record['job_id']}: {e}")
+
+    def stats(self) -> dict:
+        def ms(tracker, q):
+            value = tracker.percentile(q)
+            return value * 1000 if value is not None else None
+
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self.running,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued_bytes": self.queued_bytes,
+            "max_queued_bytes": self.max_queued_bytes,
+            "peak_queue": self.peak_queue,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "webhook_failures": self.webhook_failures,
+            "store_failures": self.store_failures,
+            "wait_p50_ms": ms(self.wait_time, 50),
+            "wait_p95_ms": ms(self.wait_time, 95),
+            "processing_p50_ms": ms(self.processing_time, 50),
+            "processing_p95_ms": ms(self.processing_time, 95),
+        }
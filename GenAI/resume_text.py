@@ -0,0 +1,166 @@
+import io
+import time
+import zipfile
+import threading
+import xml.etree.ElementTree as ET
+from typing import Optional
+from gemini_control import LatencyTracker
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+PDF_MIME = 'application/pdf'
+DOCX_MIME = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+TEXT_MIME = 'text/plain'
+OCTET_MIME = 'application/octet-stream'
+
+# Leading bytes of the formats we recognise
+_MAGIC_BYTES = [
+    (b"%PDF-", PDF_MIME),
+    (b"\x89PNG\r\n\x1a\n", 'image/png'),
+    (b"\xff\xd8\xff", 'image/jpeg'),
+    (b"GIF87a", 'image/gif'),
+    (b"GIF89a", 'image/gif'),
+]
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+def sniff_mime(data: bytes) -> str:
+    """MIME type from the file's content rather than its name"""
+    # Some generators put junk before the PDF header; readers accept it within 1 KB
+    if b"%PDF-" in data[:1024]:
+        return PDF_MIME
+    for magic, mime in _MAGIC_BYTES:
+        if data.startswith(magic):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return 'image/webp'
+    # "BM" alone would match plenty of text files; also check the size field
+    if data[:2] == b"BM" and len(data) >= 26 and int.from_bytes(data[2:6], 'little') == len(data):
+        return 'image/bmp'
+    if data.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                if "word/document.xml" in archive.namelist():
+                    return DOCX_MIME
+        except zipfile.BadZipFile:
+            pass
+        return OCTET_MIME
+    if _decode_text(data[:4096], sniffing=True) is not None:
+        return TEXT_MIME
+    return OCTET_MIME
+
+def _decode_text(data: bytes, sniffing: bool = False) -> Optional[str]:
+    """data as text, or None if it doesn't decode or is more than 5% control characters"""
+    if data.startswith((b"\xff\xfe", b"\xfe\xff")):
+        text = data.decode('utf-16', errors='replace')
+    else:
+        try:
+            text = data.decode('utf-8-sig')
+        except UnicodeDecodeError as e:
+            # A sniff window may cut a multi-byte character in half at the end
+            if not sniffing or e.start < len(data) - 3:
+                return None
+            text = data[:e.start].decode('utf-8-sig')
+    # Also applied to files only named .txt, so binary content never reaches Gemini as text
+    if sum(not c.isprintable() and c not in "\r\n\t\f" for c in text) > len(text) // 20:
+        return None
+    return text
+
+def _docx_text(data: bytes) -> str:
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        with archive.open("word/document.xml") as document:
+            paragraphs = []
+            parts = []
+            for _, element in ET.iterparse(document, events=("end",)):
+                if element.tag == _WORD_NS + "t":
+                    parts.append(element.text or "")
+                elif element.tag == _WORD_NS + "tab":
+                    parts.append("\t")
+                elif element.tag in (_WORD_NS + "br", _WORD_NS + "cr"):
+                    parts.append("\n")
+                elif element.tag == _WORD_NS + "p":
+                    paragraphs.append("".join(parts))
+                    parts = []
+                    element.clear()
+    return "\n".join(paragraphs)
+
+def _pdf_text(data: bytes) -> Optional[str]:
+    if pypdf is None:
+        return None
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+def extract_text(data: bytes, mime: str, min_chars: int = 100) -> Optional[str]:
+    """
+    Text of a PDF with a text layer, a DOCX or a plain-text file.
+
+    Returns None when the document needs the LLM instead: images, scanned
+    PDFs or DOCX files that are mostly images (fewer than min_chars letters
+    or digits extracted), unsupported formats, files that fail to parse, or
+    PDFs when pypdf isn't installed.
+    """
+    try:
+        if mime == TEXT_MIME:
+            text = _decode_text(data)
+        elif mime == DOCX_MIME:
+            text = _docx_text(data)
+        elif mime == PDF_MIME:
+            text = _pdf_text(data)
+        else:
+            return None
+    except Exception as e:
+        print(f"Warning: local {mime} extraction failed: {e}")
+        return None
+    if not text or not text.strip():
+        return None
+    if mime != TEXT_MIME and sum(c.isalnum() for c in text) < min_chars:
+        return None
+    return text.strip()
+
+class ExtractionStats:
+    """Per-format extraction latency and how often the LLM extraction call was skipped"""
+
+    def __init__(self):
+        self.formats = {}
+        # Extraction runs on worker threads
+        self._lock = threading.Lock()
+
+    def record(self, mime: str, seconds: float, local: bool):
+        with self._lock:
+            entry = self.formats.setdefault(mime, {
+                "uploads": 0, "local": 0, "latency": LatencyTracker(window=1000, min_samples=1)
+            })
+            entry["uploads"] += 1
+            entry["local"] += int(local)
+            entry["latency"].record(seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            formats = {
+                mime: {
+                    "uploads": entry["uploads"],
+                    "local": entry["local"],
+                    "p50_ms": entry["latency"].percentile(50) * 1000,
+                    "p95_ms": entry["latency"].percentile(95) * 1000,
+                }
+                for mime, entry in self.formats.items()
+            }
+        uploads = sum(entry["uploads"] for entry in formats.values())
+        local = sum(entry["local"] for entry in formats.values())
+        return {
+            "uploads": uploads,
+            "llm_extraction_skipped": local,
+            "skip_rate": local / uploads if uploads else 0.0,
+            "pdf_support": pypdf is not None,
+            "formats": formats,
+        }
+
+def timed_extract(data: bytes, mime: str, stats: ExtractionStats, min_chars: int = 100) -> Optional[str]:
+    """extract_text, recording the attempt in stats"""
+    start = time.perf_counter()
+    text = extract_text(data, mime, min_chars)
+    stats.record(mime, time.perf_counter() - start, text is not None)
+    return text
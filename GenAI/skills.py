@@ -0,0 +1,224 @@
+import json
+import math
+import hashlib
+import numpy as np
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from caching import TTLCache
+
+# Weight of a preferred skill relative to a required one in job_compatibility
+PREFERRED_SKILL_WEIGHT = 0.5
+
+def skill_importance(skill: dict) -> float:
+    """A job skill's numeric importance; missing or non-numeric values ("high") count as 1.0"""
+    try:
+        importance = float(skill.get("importance", 1.0))
+    except (TypeError, ValueError):
+        return 1.0
+    return importance if math.isfinite(importance) else 1.0
+
+def normalize_skill(name: str) -> str:
+    """Canonical form used for exact skill comparison"""
+    # Only trailing dots go, so ".net" keeps its leading one
+    name = name.lower().replace("_", " ").replace("-", " ")
+    return " ".join(name.lstrip(" ,;:").rstrip(" .,;:").split())
+
+# ==================== Skills Taxonomy ====================
+
+class SkillTaxonomy:
+    """
+    Skill names and aliases compiled into an Aho-Corasick automaton.
+
+    find() scans text once, whatever the size of the taxonomy, and only
+    accepts matches that start and end on word boundaries. Overlapping
+    matches resolve to the leftmost, then longest, one ("c++" beats "c").
+    """
+
+    def __init__(self, entries: Dict[str, List[str]]):
+        self._aliases: Dict[str, str] = {}
+        for name, aliases in entries.items():
+            canonical = normalize_skill(name)
+            for alias in [name] + list(aliases or []):
+                alias = normalize_skill(alias)
+                if alias:
+                    self._aliases.setdefault(alias, canonical)
+        # Identifies the alias table, for artifacts derived from find()
+        self.fingerprint = hashlib.sha256(json.dumps(sorted(self._aliases.items())).encode('utf-8')).hexdigest()
+        self._build_automaton()
+
+    @classmethod
+    def load(cls, path: str) -> "SkillTaxonomy":
+        """Load {"skills": [{"name": ..., "aliases": [...]}, ...]} from a JSON file"""
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls({entry["name"]: entry.get("aliases", []) for entry in data["skills"]})
+
+    def __len__(self):
+        return len(set(self._aliases.values()))
+
+    def _build_automaton(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per node: (alias length, canonical name) of every alias ending there
+        self._output: List[List[Tuple[int, str]]] = [[]]
+
+        for alias, canonical in self._aliases.items():
+            node = 0
+            for char in alias:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = next_node
+            self._output[node].append((len(alias), canonical))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def canonical(self, name: str) -> Optional[str]:
+        """Canonical skill for a name or alias, if it is in the taxonomy"""
+        return self._aliases.get(normalize_skill(name))
+
+    def find(self, text: str) -> List[str]:
+        """Canonical skills mentioned in text, in order of first mention"""
+        # Collapse whitespace so multi-word aliases match across line breaks
+        text = " ".join(text.lower().replace("_", " ").replace("-", " ").split())
+        matches = []
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, canonical in self._output[node]:
+                start = end - length
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    matches.append((start, -length, canonical))
+
+        found = []
+        seen = set()
+        covered_until = 0
+        for start, negative_length, canonical in sorted(matches):
+            if start < covered_until:
+                continue
+            covered_until = start - negative_length
+            if canonical not in seen:
+                seen.add(canonical)
+                found.append(canonical)
+        return found
+
+# ==================== Skills Matching ====================
+
+class SkillMatcher:
+    """
+    Deterministic skills comparison between a resume and a job, without an LLM.
+
+    Skills are first matched exactly after normalization; whatever is left is
+    matched by cosine similarity of skill-name embeddings. Embeddings come
+    from a cached vocabulary, so once the names involved have been seen a
+    comparison is a few small numpy operations.
+    """
+
+    def __init__(self, threshold: float = 0.8, vocabulary_size: int = 50000, taxonomy: Optional[SkillTaxonomy] = None):
+        self.threshold = threshold
+        self.vocabulary = TTLCache(maxsize=vocabulary_size)
+        self.taxonomy = taxonomy
+
+    def _normalize(self, name: str) -> str:
+        # Aliases known to the taxonomy ("nodejs", "node") resolve to one name
+        if self.taxonomy is not None:
+            canonical = self.taxonomy.canonical(name)
+            if canonical:
+                return canonical
+        return normalize_skill(name)
+
+    def missing_from_vocabulary(self, names: List[str]) -> List[str]:
+        """Normalized names that still need an embedding"""
+        normalized = {self._normalize(name) for name in names}
+        return [name for name in normalized if name and self.vocabulary.get(name) is None]
+
+    def add_to_vocabulary(self, names: List[str], vectors: np.ndarray):
+        """Store unit-length embeddings for normalized skill names"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        for name, vector in zip(names, vectors / norms):
+            self.vocabulary.set(name, vector)
+
+    def _fuzzy_matches(self, wanted: List[str], available: List[str]) -> Dict[str, str]:
+        """Map each wanted skill to its closest available skill above the threshold"""
+        wanted_vectors = [self.vocabulary.get(name) for name in wanted]
+        available_vectors = [self.vocabulary.get(name) for name in available]
+        wanted_rows = [i for i, v in enumerate(wanted_vectors) if v is not None]
+        available_rows = [i for i, v in enumerate(available_vectors) if v is not None]
+        if not wanted_rows or not available_rows:
+            return {}
+
+        similarity = np.stack([wanted_vectors[i] for i in wanted_rows]) @ np.stack([available_vectors[i] for i in available_rows]).T
+        best = similarity.argmax(axis=1)
+        return {
+            wanted[wanted_rows[row]]: available[available_rows[col]]
+            for row, col in enumerate(best.tolist())
+            if similarity[row, col] >= self.threshold
+        }
+
+    def match(self, resume_skills: List[str], required: List[Dict], preferred: List[Dict]) -> dict:
+        """
+        Compare skills and return SkillMatchResult fields plus a per-tier breakdown.
+
+        required and preferred are job skill dicts ({"name": ..., "importance": ...});
+        importance defaults to 1.0, and names that aren't strings are skipped.
+        """
+        have = {self._normalize(name) for name in resume_skills if isinstance(name, str) and name}
+        tiers = {
+            tier: [skill for skill in skills or [] if isinstance(skill, dict) and isinstance(skill.get("name"), str)
+                   and skill["name"]]
+            for tier, skills in (("required", required), ("preferred", preferred))
+        }
+
+        wanted = [self._normalize(skill["name"]) for tier in tiers.values() for skill in tier]
+        fuzzy = self._fuzzy_matches([name for name in wanted if name not in have], sorted(have))
+
+        matched, missing = [], []
+        breakdown = {}
+        weighted_total = weighted_matched = 0.0
+        for tier, skills in tiers.items():
+            tier_weight = PREFERRED_SKILL_WEIGHT if tier == "preferred" else 1.0
+            tier_matched, tier_missing = [], []
+            for skill in skills:
+                name = self._normalize(skill["name"])
+                importance = skill_importance(skill) * tier_weight
+                weighted_total += importance
+                if name in have or name in fuzzy:
+                    tier_matched.append(skill["name"])
+                    weighted_matched += importance
+                else:
+                    tier_missing.append(skill["name"])
+            matched.extend(tier_matched)
+            missing.extend(tier_missing)
+            breakdown[tier] = {
+                "matched": tier_matched,
+                "missing": tier_missing,
+                "match_rate": round(100.0 * len(tier_matched) / len(skills), 1) if skills else 100.0,
+            }
+
+        return {
+            "matched_skills": matched,
+            "missing_skills": missing,
+            "match_percentage": breakdown["required"]["match_rate"],
+            "job_compatibility": round(100.0 * weighted_matched / weighted_total, 1) if weighted_total else 100.0,
+            "required": breakdown["required"],
+            "preferred": breakdown["preferred"],
+            "fuzzy_matches": {name: fuzzy[name] for name in wanted if name in fuzzy},
+        }
@@ -2,7 +2,10 @@ import asyncio
 import httpx
 import json
 import base64
+import io
 import os
+import time
+import zipfile
 from pprint import pprint
 
 # Configuration
@@ -190,6 +193,34 @@ resume_data = {
     ]
 }
 
+async def test_readiness(client, timeout: float = 180.0):
+    """Test the health endpoints, waiting for background startup to finish"""
+    print("\n===== TESTING HEALTH AND READINESS =====")
+    
+    try:
+        response = await client.get(f"{BASE_URL}/healthz")
+        if response.status_code != 200:
+            print(f"❌ ERROR: /healthz returned HTTP {response.status_code}")
+            return None
+        print("✅ SUCCESS: /healthz is up")
+        
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            response = await client.get(f"{BASE_URL}/readyz")
+            state = response.json()
+            if response.status_code == 200:
+                print(f"✅ SUCCESS: Service ready, startup timings (ms): {state['timings_ms']}")
+                return state
+            if state.get("error"):
+                print(f"❌ ERROR: Startup failed: {state['error']}")
+                return None
+            await asyncio.sleep(1)
+        print(f"❌ ERROR: Service not ready after {timeout:.0f}s")
+    except Exception as e:
+        print(f"❌ ERROR: {str(e)}")
+    
+    return None
+
 async def test_resume_parse(client):
     """Test the resume parsing endpoint with base64 encoded resume"""
     print("\n===== TESTING RESUME PARSING =====")
@@ -224,6 +255,110 @@ async def test_resume_parse(client):
     
     return None
 
+def make_docx(text: str) -> bytes:
+    """Minimal DOCX with one paragraph per line of text"""
+    from xml.sax.saxutils import escape
+    paragraphs = "".join(f"<w:p><w:r><w:t>{escape(line)}</w:t></w:r></w:p>" for line in text.splitlines())
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("[Content_Types].xml", '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>')
+        archive.writestr(
+            "word/document.xml",
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body>{paragraphs}</w:body></w:document>"
+        )
+    return buffer.getvalue()
+
+async def test_resume_parse_docx(client):
+    """Test that a DOCX upload is read locally instead of by a Gemini extraction call"""
+    print("\n===== TESTING LOCAL DOCX RESUME EXTRACTION =====")
+    
+    try:
+        before = (await client.get(f"{BASE_URL}/api/metrics")).json()["resume_extraction"]["llm_extraction_skipped"]
+        files = {"file": ("resume.docx", make_docx(sample_resume_text), "application/octet-stream")}
+        response = await client.post(f"{BASE_URL}/api/resume/parse", files=files)
+        if response.status_code != 200:
+            print(f"❌ ERROR: HTTP {response.status_code}")
+            print(f"Response: {response.text}")
+            return None
+        after = (await client.get(f"{BASE_URL}/api/metrics")).json()["resume_extraction"]["llm_extraction_skipped"]
+        if after == before + 1:
+            print("✅ SUCCESS: DOCX text extracted locally")
+        else:
+            print("❌ ERROR: DOCX upload went to the Gemini extraction call")
+        return response.json()
+    except Exception as e:
+        print(f"❌ ERROR: {str(e)}")
+    
+    return None
+
+async def test_resume_job(client, timeout: float = 120.0):
+    """Test queueing a resume for background parsing and polling for the result"""
+    print("\n===== TESTING RESUME PARSE JOBS =====")
+    
+    try:
+        response = await client.post(f"{BASE_URL}/api/resume/jobs", data={"file_content": sample_resume_base64})
+        if response.status_code != 202:
+            print(f"❌ ERROR: HTTP {response.status_code}")
+            print(f"Response: {response.text}")
+            return None
+        job = response.json()
+        print(f"✅ SUCCESS: Job {job['job_id']} queued")
+        
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            record = (await client.get(f"{BASE_URL}{job['status_url']}")).json()
+            if record["status"] == "done":
+                print(f"✅ SUCCESS: Job finished, parsed name: {record['result'].get('name')}")
+                return record
+            if record["status"] == "failed":
+                print(f"❌ ERROR: Job failed: {record['error']}")
+                return record
+            await asyncio.sleep(1)
+        print(f"❌ ERROR: Job not finished after {timeout:.0f}s")
+    except Exception as e:
+        print(f"❌ ERROR: {str(e)}")
+    
+    return None
+
+async def test_resume_bulk(client):
+    """Test bulk parsing of a zip of resumes and resuming the run"""
+    print("\n===== TESTING BULK RESUME PARSING =====")
+    
+    try:
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as z:
+            z.writestr("resumes/resume.txt", sample_resume_text)
+            z.writestr("resumes/resume.docx", make_docx(sample_resume_text))
+        files = {"files": ("resumes.zip", archive.getvalue(), "application/zip")}
+        
+        response = await client.post(f"{BASE_URL}/api/resume/bulk", files=files, timeout=300.0)
+        if response.status_code != 200:
+            print(f"❌ ERROR: HTTP {response.status_code}")
+            print(f"Response: {response.text}")
+            return None
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        totals = lines[-1]
+        if totals.get("complete") and totals["done"] + totals["failed"] == 2:
+            print(f"✅ SUCCESS: Bulk run {totals['run_id']}: {totals['done']} parsed, {totals['failed']} failed")
+        else:
+            print(f"❌ ERROR: Unexpected bulk totals: {totals}")
+            return None
+        
+        # A rerun with the same run id replays finished files without parsing them again
+        response = await client.post(f"{BASE_URL}/api/resume/bulk", files=files, data={"run_id": totals["run_id"]},
+                                     timeout=300.0)
+        rerun = [json.loads(line) for line in response.text.splitlines()][-1]
+        if rerun["resumed"] == totals["done"]:
+            print(f"✅ SUCCESS: Rerun resumed {rerun['resumed']} finished files")
+        else:
+            print(f"❌ ERROR: Rerun resumed {rerun['resumed']} files, expected {totals['done']}")
+        return lines
+    except Exception as e:
+        print(f"❌ ERROR: {str(e)}")
+    
+    return None
+
 async def test_job_matching(client):
     """Test the job matching endpoint"""
     print("\n===== TESTING JOB-RESUME MATCHING =====")
@@ -290,6 +425,132 @@ async def test_job_matching(client):
     
     return None
 
+async def test_job_match_modes(client):
+    """Test job matching end to end in the default mode (JOB_MATCH_MODE) and each explicit mode"""
+    print("\n===== TESTING JOB MATCH MODES =====")
+    
+    match_request = {"resume": resume_data, "job": sample_job}
+    results = {}
+    for mode in (None, "single", "two_call"):
+        label = mode or "default"
+        try:
+            params = {"mode": mode} if mode else {}
+            response = await client.post(f"{BASE_URL}/api/jobs/match", json=match_request, params=params)
+            if response.status_code != 200:
+                print(f"❌ ERROR: {label} mode returned HTTP {response.status_code}")
+                print(f"Response: {response.text}")
+                continue
+            result = response.json()
+            if "sections" in result["match_details"] and "improvements" in result["feedback"]:
+                print(f"✅ SUCCESS: {label} mode, match score {result['match_score']:.1f}%")
+            else:
+                print(f"❌ ERROR: {label} mode returned incomplete match details or feedback")
+            results[label] = result
+        except Exception as e:
+            print(f"❌ ERROR: {label} mode: {str(e)}")
+        await asyncio.sleep(1)
+    
+    return results
+
+async def test_skill_matching(client):
+    """Test the local skills matching endpoint"""
+    print("\n===== TESTING LOCAL SKILLS MATCHING =====")
+    
+    print("\nTest Case 1: Skills match without Gemini")
+    try:
+        response = await client.post(f"{BASE_URL}/api/skills/match", json={"resume": resume_data, "job": sample_job})
+        if response.status_code == 200:
+            result = response.json()
+            print("✅ SUCCESS: Skills matched locally")
+            print(f"  Required match: {result['match_percentage']:.1f}%")
+            print(f"  Job compatibility: {result['job_compatibility']:.1f}%")
+            print(f"  Matched: {', '.join(result['matched_skills'])}")
+            print(f"  Missing: {', '.join(result['missing_skills'])}")
+            return result
+        else:
+            print(f"❌ ERROR: HTTP {response.status_code}")
+            print(f"Response: {response.text}")
+    except Exception as e:
+        print(f"❌ ERROR: {str(e)}")
+    
+    return None
+
+async def test_batch_job_matching(client):
+    """Test the batch job matching endpoint"""
+    print("\n===== TESTING BATCH JOB MATCHING =====")
+    
+    print("\nTest Case 1: One resume against several jobs")
+    jobs = [
+        sample_job,
+        dict(sample_job, title="Frontend React Developer", description_text="Build accessible React interfaces with TypeScript and CSS.",
+             required_skills=[{"name": "React"}, {"name": "TypeScript"}], preferred_skills=[]),
+        dict(sample_job, title="Registered Nurse", description_text="Provide patient care in a hospital setting.",
+             required_skills=[{"name": "Patient care"}], preferred_skills=[])
+    ]
+    batch_request = {"resume": resume_data, "jobs": jobs, "top_n": 2}
+    
+    try:
+        results = []
+        async with client.stream("POST", f"{BASE_URL}/api/jobs/match/batch", json=batch_request) as response:
+            if response.status_code != 200:
+                print(f"❌ ERROR: HTTP {response.status_code}")
+                return None
+            async for line in response.aiter_lines():
+                if line.strip():
+                    results.append(json.loads(line))
+        analyzed = [r for r in results if r["analyzed"]]
+        print(f"✅ SUCCESS: Received {len(results)} results, {len(analyzed)} analyzed by Gemini")
+        for result in results:
+            score = f"{result['match_score']:.1f}%" if result["analyzed"] else "not analyzed"
+            print(f"  {jobs[result['job_index']]['title']}: pre-rank {result['prerank_score']:.2f}, match {score}")
+        return results
+    except Exception as e:
+        print(f"❌ ERROR: {str(e)}")
+    
+    return None
+
+async def test_candidate_search(client):
+    """Test indexing job-seeker profiles and searching them for a job"""
+    print("\n===== TESTING CANDIDATE SEARCH =====")
+    
+    print("\nTest Case 1: Index profiles and search for a job")
+    nurse_profile = dict(sample_profile, name="Jane Roe", email="janeroe@example.com",
+                         skills="Patient care, Triage, Medication administration",
+                         experience="6 years as a registered nurse", education="BSc Nursing")
+    try:
+        for profile_id, profile in (("john-doe", sample_profile), ("jane-roe", nurse_profile)):
+            response = await client.put(f"{BASE_URL}/api/candidates/{profile_id}", json=profile)
+            if response.status_code != 200:
+                print(f"❌ ERROR: HTTP {response.status_code}")
+                print(f"Response: {response.text}")
+                return None
+        
+        response = await client.post(f"{BASE_URL}/api/candidates/search", json={"job": sample_job, "limit": 2})
+        if response.status_code == 200:
+            result = response.json()
+            print("✅ SUCCESS: Candidate search completed")
+            for candidate in result:
+                print(f"  {candidate['name']}: {candidate['score']:.2f}")
+            if result and result[0]["profile_id"] != "john-doe":
+                print("⚠️ WARNING: Expected the Python developer to rank first")
+        else:
+            print(f"❌ ERROR: HTTP {response.status_code}")
+            print(f"Response: {response.text}")
+    except Exception as e:
+        print(f"❌ ERROR: {str(e)}")
+    
+    # Test 2: Company profiles are rejected
+    print("\nTest Case 2: Indexing a company profile")
+    try:
+        response = await client.put(f"{BASE_URL}/api/candidates/acme", json={"userType": "company", "company_name": "Acme"})
+        print(f"Status Code: {response.status_code}")
+        if response.status_code == 400:
+            print("✅ EXPECTED FAILURE: Server correctly rejected company profile")
+    except Exception as e:
+        print(f"❌ ERROR: {str(e)}")
+    
+    return None
+
 async def test_course_recommendations(client):
     """Test the course recommendation endpoint"""
     print("\n===== TESTING COURSE RECOMMENDATIONS =====")
@@ -429,6 +690,75 @@ async def test_chat(client):
     
     return None
 
+async def test_chat_long_history(client, messages: int = 40):
+    """Test that a long chat history is compacted into a summary plus recent turns"""
+    print("\n===== TESTING CHAT HISTORY COMPACTION =====")
+    
+    history = []
+    for i in range(messages):
+        if i % 2 == 0:
+            content = f"Question {i}: how should I prepare for interviews for remote data analyst roles with a visual impairment?"
+        else:
+            content = f"Answer {i}: " + "Practice with a screen reader, ask about accessible interview formats, and prepare examples. " * 12
+        history.append({"role": "user" if i % 2 == 0 else "assistant", "content": content})
+    
+    try:
+        before = (await client.get(f"{BASE_URL}/api/metrics")).json()["chat_history"]
+        response = await client.post(f"{BASE_URL}/api/chat", json={"message": "What should I do next?", "history": history})
+        if response.status_code != 200:
+            print(f"❌ ERROR: HTTP {response.status_code}")
+            print(f"Response: {response.text}")
+            return None
+        after = (await client.get(f"{BASE_URL}/api/metrics")).json()["chat_history"]
+        if after["compacted"] == before["compacted"] + 1:
+            sent = after["sent_tokens"] - before["sent_tokens"]
+            full = after["history_tokens"] - before["history_tokens"]
+            print(f"✅ SUCCESS: {messages}-message history sent as ~{sent} tokens instead of ~{full}")
+        else:
+            print("❌ ERROR: Long history was not compacted")
+        return response.json()
+    except Exception as e:
+        print(f"❌ ERROR: {str(e)}")
+    
+    return None
+
+async def test_chat_stream(client):
+    """Test the streaming chat endpoint"""
+    print("\n===== TESTING STREAMING CHAT ENDPOINT =====")
+    
+    print("\nTest Case 1: Streamed chat with profile")
+    chat_request = {
+        "message": "How should I prepare for a remote job interview?",
+        "profile": sample_profile,
+        "history": []
+    }
+    
+    try:
+        chunks = []
+        async with client.stream("POST", f"{BASE_URL}/api/chat/stream", json=chat_request) as response:
+            if response.status_code != 200:
+                print(f"❌ ERROR: HTTP {response.status_code}")
+                return None
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):])
+                    if event == "error":
+                        print(f"❌ ERROR: {data['error']}")
+                        return None
+                    if "text" in data:
+                        chunks.append(data["text"])
+        print(f"✅ SUCCESS: Received {len(chunks)} streamed chunks")
+        reply = "".join(chunks)
+        print("\nResponse preview: " + reply[:200] + "...")
+        return reply
+    except Exception as e:
+        print(f"❌ ERROR: {str(e)}")
+    
+    return None
+
 async def run_all_tests():
     """Run all test cases with appropriate delays between tests"""
     print("🚀 STARTING API TESTS")
@@ -441,20 +771,56 @@ async def run_all_tests():
     
     # Create a client with a reasonable timeout
     async with httpx.AsyncClient(timeout=60.0) as client:
+        # Wait for the model and course catalog to load
+        await test_readiness(client)
+        
         # Test resume parsing
         await test_resume_parse(client)
         await asyncio.sleep(1)  # Avoid rate limiting
         
+        # Test local DOCX extraction
+        await test_resume_parse_docx(client)
+        await asyncio.sleep(1)
+        
+        # Test background resume parsing
+        await test_resume_job(client)
+        await asyncio.sleep(1)
+        
+        # Test bulk resume parsing
+        await test_resume_bulk(client)
+        await asyncio.sleep(1)
+        
         # Test job matching
         await test_job_matching(client)
         await asyncio.sleep(1)
         
+        # Test the default and explicit job match modes
+        await test_job_match_modes(client)
+        
+        # Test local skills matching
+        await test_skill_matching(client)
+        
+        # Test batch job matching
+        await test_batch_job_matching(client)
+        await asyncio.sleep(1)
+        
+        # Test candidate search
+        await test_candidate_search(client)
+        
         # Test course recommendations
         await test_course_recommendations(client)
         await asyncio.sleep(1)
         
         # Test chat
         await test_chat(client)
+        await asyncio.sleep(1)
+        
+        # Test chat history compaction
+        await test_chat_long_history(client)
+        await asyncio.sleep(1)
+        
+        # Test streaming chat
+        await test_chat_stream(client)
     
     print("\n✅ ALL TESTS COMPLETED")
 
@@ -0,0 +1,122 @@
+import io
+import json
+import binascii
+
+# Base64 text is decoded this many characters at a time
+DECODE_CHUNK_CHARS = 1024 * 1024
+
+# Everything base64 decoding skips: whitespace, line breaks and other stray bytes
+_BASE64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+_NON_BASE64 = bytes(set(range(256)) - set(_BASE64_ALPHABET))
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload is bigger than the configured limit"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit} byte limit")
+        self.limit = limit
+
+def read_upload(fileobj, max_bytes: int) -> bytes:
+    """
+    An uploaded file as one bytes object, refused before reading if it's over max_bytes.
+
+    The multipart parser has already spooled the upload (to disk past 1 MB),
+    so its size is known up front and the read allocates exactly one buffer.
+    That buffer is what sniffing, extraction, hashing and Gemini all share.
+    """
+    fileobj.seek(0, io.SEEK_END)
+    size = fileobj.tell()
+    if size > max_bytes:
+        raise UploadTooLargeError(max_bytes)
+    fileobj.seek(0)
+    return fileobj.read(size)
+
+def decode_base64(text: str, max_bytes: int) -> bytes:
+    """
+    base64.b64decode(text) in chunks, stopping once the output passes max_bytes.
+
+    Decoding piecewise avoids the full ASCII copy of text that b64decode
+    makes first, and the decoded bytes are written straight into the
+    buffer that is returned. Raises ValueError for malformed input.
+    """
+    out = io.BytesIO()
+    carry = b""
+    for start in range(0, len(text), DECODE_CHUNK_CHARS):
+        chunk = carry + text[start:start + DECODE_CHUNK_CHARS].encode('ascii').translate(None, _NON_BASE64)
+        whole = len(chunk) // 4 * 4
+        out.write(binascii.a2b_base64(chunk[:whole]))
+        carry = chunk[whole:]
+        if out.tell() > max_bytes:
+            raise UploadTooLargeError(max_bytes)
+    if carry:
+        out.write(binascii.a2b_base64(carry))
+    if out.tell() > max_bytes:
+        raise UploadTooLargeError(max_bytes)
+    return out.getvalue()
+
+class UploadLimitMiddleware:
+    """
+    Answer 413 once a request body to one of the limited paths passes its byte limit.
+
+    Requests announcing a larger Content-Length are refused before any of the
+    body is read; chunked ones are cut off as soon as they go over, so an
+    oversized upload never reaches the multipart parser's spool in full.
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        try:
+            declared = int(headers.get(b"content-length", b"0"))
+        except ValueError:
+            declared = 0
+        if declared > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        exceeded = False
+        responded = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # The app sees a disconnect; the response it then sends is swapped for the 413
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal responded
+            if not exceeded:
+                await send(message)
+            elif message["type"] == "http.response.start" and not responded:
+                responded = True
+                await self._reject(send, limit)
+
+        await self.app(scope, limited_receive, guarded_send)
+        if exceeded and not responded:
+            await self._reject(send, limit)
+
+    @staticmethod
+    async def _reject(send, limit: int):
+        body = json.dumps({"detail": str(UploadTooLargeError(limit))}).encode('utf-8')
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,482 @@
+import os
+import json
+import time
+import numpy as np
+from typing import Optional, Tuple
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+# ==================== Helpers ====================
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize rows into a contiguous float32 array.
+
+    Rows that are already unit length are returned without a copy, so a
+    pre-normalized memory-mapped matrix stays shared; treat the result as
+    read-only.
+    """
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    if np.all(np.abs(norms - 1.0) < 1e-4):
+        return matrix
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without a full sort"""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    if k < scores.shape[0]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+def top_k_batch(scores: np.ndarray, k: int) -> np.ndarray:
+    """Row-wise top_k for a (queries, candidates) score matrix"""
+    n = scores.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape).copy()
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+# ==================== Index Backends ====================
+
+class ExactIndex:
+    """
+    Brute-force cosine search over a pre-normalized matrix.
+
+    Vectors are normalized once at build time, so scoring is a single
+    matrix product. dtype="float16" halves memory; dtype="int8" stores
+    symmetric per-row quantized codes (a quarter of float32). Compressed
+    rows are widened to float32 a block at a time while scoring.
+
+    With rerank > 0 a compressed index keeps a reference to the raw
+    embeddings (normally the memory-mapped artifact, shared by every
+    worker through the page cache) and rescores the best rerank
+    candidates exactly.
+    """
+    backend = "exact"
+    block_rows = 4096
+
+    def __init__(self, embeddings: np.ndarray, dtype: str = "float32", rerank: int = 0):
+        if dtype not in ("float32", "float16", "int8"):
+            raise ValueError(f"Unsupported index dtype: {dtype}")
+        self.dtype = dtype
+        self.scales = None
+        self.embeddings = embeddings if rerank and dtype != "float32" else None
+        self.rerank = rerank
+        if dtype == "float32":
+            self.vectors = normalize_rows(embeddings)
+            return
+
+        # Quantize a block at a time so no full float32 copy is ever held
+        n = embeddings.shape[0]
+        self.vectors = np.empty(embeddings.shape, dtype=np.float16 if dtype == "float16" else np.int8)
+        if dtype == "int8":
+            self.scales = np.empty(n, dtype=np.float32)
+        for start in range(0, n, self.block_rows):
+            block = normalize_rows(embeddings[start:start + self.block_rows])
+            if dtype == "float16":
+                self.vectors[start:start + len(block)] = block
+                continue
+            scales = np.abs(block).max(axis=1)
+            scales[scales == 0] = 1.0
+            self.vectors[start:start + len(block)] = np.round(block * (127.0 / scales[:, None]))
+            self.scales[start:start + len(block)] = scales / 127.0
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the index itself, excluding the mapped embeddings"""
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine scores of every course for each query, shape (queries, courses)"""
+        queries = normalize_rows(queries)
+        if self.dtype == "float32":
+            return queries @ self.vectors.T
+        scores = np.empty((queries.shape[0], len(self)), dtype=np.float32)
+        for start in range(0, len(self), self.block_rows):
+            block = self.vectors[start:start + self.block_rows].astype(np.float32)
+            scores[:, start:start + self.block_rows] = queries @ block.T
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, cosine scores) of the k nearest courses"""
+        indices, scores = self.search_batch(query, k)
+        return indices[0], scores[0]
+
+    def search_batch(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top k for many queries at once; both results have shape (queries, k)"""
+        queries = normalize_rows(queries)
+        scores = self.scores(queries)
+        if self.embeddings is None:
+            indices = top_k_batch(scores, k)
+            return indices, np.take_along_axis(scores, indices, axis=1)
+        candidates = top_k_batch(scores, max(k, self.rerank))
+        return _stack_results([
+            rerank_exact(self.embeddings, query, row, k) for query, row in zip(queries, candidates)
+        ], k)
+
+    def save(self, path: str):
+        # Nothing to persist; the index is derived from the embeddings artifact
+        pass
+
+class IVFIndex:
+    """Inverted-file index: k-means coarse quantizer, exact scoring inside probed lists"""
+    backend = "ivf"
+
+    def __init__(self, vectors: np.ndarray, centroids: np.ndarray, order: np.ndarray,
+                 offsets: np.ndarray, nprobe: int = 8):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, nlist: Optional[int] = None, nprobe: int = 8,
+              iterations: int = 10, sample_size: int = 50000, seed: int = 0) -> "IVFIndex":
+        """Train centroids on a sample and assign every vector to its nearest list"""
+        vectors = normalize_rows(embeddings)
+        n = vectors.shape[0]
+        nlist = max(1, min(nlist or int(4 * np.sqrt(n)), n))
+        rng = np.random.default_rng(seed)
+
+        sample = vectors[rng.choice(n, size=min(n, max(sample_size, nlist)), replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = normalize_rows(centroids)
+
+        assignment = np.empty(n, dtype=np.int64)
+        for start in range(0, n, 65536):
+            assignment[start:start + 65536] = np.argmax(vectors[start:start + 65536] @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=offsets[1:])
+        return cls(vectors, centroids, order, offsets, nprobe)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, cosine scores) of approximately the k nearest courses"""
+        query = normalize_rows(query)[0]
+        probes = top_k(self.centroids @ query, self.nprobe)
+        candidates = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probes])
+        scores = self.vectors[candidates] @ query
+        best = top_k(scores, k)
+        return candidates[best], scores[best]
+
+    def search_batch(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top k for many queries; rows shorter than k are padded with -1 / -inf"""
+        return _stack_results([self.search(query, k) for query in normalize_rows(queries)], k)
+
+    def save(self, path: str):
+        np.savez(path + ".npz", centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path: str, embeddings: np.ndarray, nprobe: int = 8) -> "IVFIndex":
+        data = np.load(path + ".npz")
+        return cls(normalize_rows(embeddings), data["centroids"], data["order"], data["offsets"], nprobe)
+
+class HNSWIndex:
+    """Graph-based ANN index backed by hnswlib"""
+    backend = "hnsw"
+
+    def __init__(self, index, size: int):
+        self.index = index
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, m: int = 16, ef_construction: int = 200, ef: int = 64) -> "HNSWIndex":
+        if hnswlib is None:
+            raise RuntimeError("hnswlib is not installed; pip install hnswlib to use the hnsw backend")
+        vectors = normalize_rows(embeddings)
+        index = hnswlib.Index(space='ip', dim=vectors.shape[1])
+        index.init_index(max_elements=vectors.shape[0], M=m, ef_construction=ef_construction)
+        index.add_items(vectors, np.arange(vectors.shape[0]))
+        index.set_ef(ef)
+        return cls(index, vectors.shape[0])
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, cosine scores) of approximately the k nearest courses"""
+        k = min(k, self.size)
+        if k <= 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        labels, distances = self.index.knn_query(normalize_rows(query), k=k)
+        # Inner-product distance is 1 - cosine for normalized vectors
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+    def search_batch(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top k for many queries in one knn_query call"""
+        k = min(k, self.size)
+        labels, distances = self.index.knn_query(normalize_rows(queries), k=k)
+        return labels.astype(np.int64), 1.0 - distances
+
+    def save(self, path: str):
+        self.index.save_index(path + ".bin")
+
+    @classmethod
+    def load(cls, path: str, embeddings: np.ndarray, ef: int = 64) -> "HNSWIndex":
+        if hnswlib is None:
+            raise RuntimeError("hnswlib is not installed; pip install hnswlib to use the hnsw backend")
+        if not os.path.exists(path + ".bin"):
+            raise FileNotFoundError(path + ".bin")
+        index = hnswlib.Index(space='ip', dim=embeddings.shape[1])
+        index.load_index(path + ".bin", max_elements=embeddings.shape[0])
+        index.set_ef(ef)
+        return cls(index, embeddings.shape[0])
+
+class PQIndex:
+    """
+    Product-quantized index: each vector is stored as one byte per subspace.
+
+    Vectors are split into m subvectors and each is replaced by the id of
+    its nearest centroid in a 256-entry codebook; with the default four
+    dimensions per subspace a 384-d catalog costs 96 bytes per course
+    instead of 1536. Queries are scored through a
+    (m, 256) lookup table; the best rerank candidates are then rescored
+    exactly against the raw embeddings.
+    """
+    backend = "pq"
+
+    def __init__(self, embeddings: np.ndarray, codebooks: np.ndarray, codes: np.ndarray, rerank: int = 100):
+        self.embeddings = embeddings
+        self.codebooks = codebooks
+        # (m, n) so each subspace's codes are contiguous for the table lookups
+        self.codes = codes
+        self.rerank = rerank
+
+    def __len__(self):
+        return self.codes.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the index itself, excluding the mapped embeddings"""
+        return self.codebooks.nbytes + self.codes.nbytes
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, m: Optional[int] = None, iterations: int = 10,
+              sample_size: int = 20000, seed: int = 0, rerank: int = 100) -> "PQIndex":
+        """Train one 256-centroid codebook per subspace and encode every vector"""
+        n, dim = embeddings.shape
+        m = m or max(1, dim // 4)
+        if dim % m:
+            raise ValueError(f"Embedding size {dim} is not divisible by {m} subspaces")
+        sub = dim // m
+        ksub = min(256, n)
+        rng = np.random.default_rng(seed)
+
+        sample = normalize_rows(embeddings[np.sort(rng.choice(n, size=min(n, max(sample_size, ksub)), replace=False))])
+        codebooks = np.empty((m, ksub, sub), dtype=np.float32)
+        for j in range(m):
+            points = sample[:, j * sub:(j + 1) * sub]
+            centroids = points[rng.choice(points.shape[0], size=ksub, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = _nearest_centroid(points, centroids)
+                counts = np.bincount(assignment, minlength=ksub)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, points)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            codebooks[j] = centroids
+
+        codes = np.empty((m, n), dtype=np.uint8)
+        for start in range(0, n, 65536):
+            block = normalize_rows(embeddings[start:start + 65536])
+            for j in range(m):
+                codes[j, start:start + len(block)] = _nearest_centroid(block[:, j * sub:(j + 1) * sub], codebooks[j])
+        return cls(embeddings, codebooks, codes, rerank)
+
+    def approximate_scores(self, query: np.ndarray) -> np.ndarray:
+        """Approximate cosine score of every course from the lookup table"""
+        m, _, sub = self.codebooks.shape
+        table = np.einsum('jcs,js->jc', self.codebooks, query.reshape(m, sub))
+        scores = np.zeros(len(self), dtype=np.float32)
+        for j in range(m):
+            scores += table[j][self.codes[j]]
+        return scores
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, cosine scores) of approximately the k nearest courses"""
+        query = normalize_rows(query)[0]
+        scores = self.approximate_scores(query)
+        if not self.rerank:
+            best = top_k(scores, k)
+            return best, scores[best]
+        return rerank_exact(self.embeddings, query, top_k(scores, max(k, self.rerank)), k)
+
+    def search_batch(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top k for many queries; rows shorter than k are padded with -1 / -inf"""
+        return _stack_results([self.search(query, k) for query in normalize_rows(queries)], k)
+
+    def save(self, path: str):
+        np.savez(path + ".npz", codebooks=self.codebooks, codes=self.codes)
+
+    @classmethod
+    def load(cls, path: str, embeddings: np.ndarray, rerank: int = 100) -> "PQIndex":
+        data = np.load(path + ".npz")
+        if data["codes"].shape[1] != embeddings.shape[0]:
+            raise ValueError("Saved pq index does not match the catalog size")
+        return cls(embeddings, data["codebooks"], data["codes"], rerank)
+
+def _nearest_centroid(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the closest centroid (squared L2) for each point"""
+    distances = (centroids * centroids).sum(axis=1) - 2.0 * (points @ centroids.T)
+    return np.argmin(distances, axis=1)
+
+def rerank_exact(embeddings: np.ndarray, query: np.ndarray, candidates: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Rescore candidate rows exactly against the raw embeddings and keep the best k"""
+    # Sorted reads touch the mapped file in order
+    candidates = np.sort(candidates)
+    scores = normalize_rows(embeddings[candidates]) @ query
+    best = top_k(scores, k)
+    return candidates[best], scores[best]
+
+def _stack_results(results, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Stack per-query (indices, scores) into padded (queries, k) arrays"""
+    width = min(k, max((len(indices) for indices, _ in results), default=0))
+    indices = np.full((len(results), width), -1, dtype=np.int64)
+    scores = np.full((len(results), width), -np.inf, dtype=np.float32)
+    for row, (found, found_scores) in enumerate(results):
+        indices[row, :len(found)] = found[:width]
+        scores[row, :len(found)] = found_scores[:width]
+    return indices, scores
+
+# ==================== Building and Loading ====================
+
+INDEX_BACKENDS = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+    "hnsw": HNSWIndex,
+    "pq": PQIndex,
+}
+
+def index_path(cache_dir: str, backend: str, fingerprint: str) -> str:
+    """Base path (without extension) of a saved index for a catalog fingerprint"""
+    return os.path.join(cache_dir, f"course_index-{backend}-{fingerprint[:16]}")
+
+def build_index(backend: str, embeddings: np.ndarray, **params):
+    """Build an index of the given backend from raw embeddings"""
+    if backend == "exact":
+        return ExactIndex(embeddings, **params)
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown index backend: {backend}")
+    return INDEX_BACKENDS[backend].build(embeddings, **params)
+
+def load_or_build_index(backend: str, embeddings: np.ndarray, cache_dir: str, fingerprint: str,
+                        dtype: str = "float32", rerank: int = 0, **params):
+    """
+    Load a saved index for this catalog, building and saving it if missing.
+
+    ANN indexes are meant to be built offline with `python vector_index.py`;
+    if none is found the service builds one at startup. Any failure falls back
+    to the exact backend so recommendations keep working. rerank sets how many
+    candidates compressed indexes (int8/float16 exact, pq) rescore exactly.
+    """
+    if backend == "exact":
+        return ExactIndex(embeddings, dtype, rerank)
+
+    if backend == "pq" and rerank:
+        params["rerank"] = rerank
+    path = index_path(cache_dir, backend, fingerprint)
+    try:
+        try:
+            return INDEX_BACKENDS[backend].load(path, embeddings, **params)
+        except FileNotFoundError:
+            print(f"Warning: no saved {backend} index at {path}, building one now")
+        index = build_index(backend, embeddings, **params)
+        os.makedirs(cache_dir, exist_ok=True)
+        index.save(path)
+        return index
+    except (KeyError, RuntimeError, ValueError, OSError) as e:
+        print(f"Warning: falling back to exact course index: {e}")
+        return ExactIndex(embeddings, dtype, rerank)
+
+# ==================== Evaluation ====================
+
+def evaluate_index(index, baseline: ExactIndex, queries: np.ndarray, k: int = 10) -> dict:
+    """Recall@k and per-query latency of an index against the exact baseline"""
+    recall_hits = 0
+    index_times = []
+    baseline_times = []
+    for query in queries:
+        start = time.perf_counter()
+        expected, _ = baseline.search(query, k)
+        baseline_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        found, _ = index.search(query, k)
+        index_times.append(time.perf_counter() - start)
+
+        recall_hits += len(set(expected.tolist()) & set(found.tolist()))
+
+    def ms(times, q):
+        return float(np.percentile(times, q) * 1000)
+
+    return {
+        "backend": index.backend,
+        "size": len(index),
+        "k": k,
+        f"recall@{k}": recall_hits / max(1, k * len(queries)),
+        "p50_ms": ms(index_times, 50),
+        "p99_ms": ms(index_times, 99),
+        "exact_p50_ms": ms(baseline_times, 50),
+        "exact_p99_ms": ms(baseline_times, 99),
+    }
+
+if __name__ == "__main__":
+    # Offline build: python vector_index.py --backend ivf
+    import argparse
+    from embeddings import load_course_embeddings, course_text, catalog_fingerprint
+
+    parser = argparse.ArgumentParser(description="Build and save the course vector index")
+    parser.add_argument("--backend", choices=["ivf", "hnsw", "pq"], default="ivf")
+    parser.add_argument("--courses", default="courses.json")
+    parser.add_argument("--cache-dir", default=os.environ.get('EMBEDDINGS_CACHE_DIR', 'embeddings_cache'))
+    parser.add_argument("--model", default='all-MiniLM-L6-v2')
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    with open(args.courses, "r") as f:
+        texts = [course_text(course) for course in json.load(f)]
+    embeddings = load_course_embeddings(texts, lambda: SentenceTransformer(args.model), args.model, args.cache_dir)
+
+    start = time.perf_counter()
+    index = build_index(args.backend, embeddings)
+    print(f"Built {args.backend} index over {len(index)} courses in {time.perf_counter() - start:.1f}s")
+    index.save(index_path(args.cache_dir, args.backend, catalog_fingerprint(texts, args.model)))
+
+    # Use perturbed course vectors as queries for a quick recall check
+    rng = np.random.default_rng(0)
+    sample = np.asarray(embeddings[rng.choice(len(texts), size=min(200, len(texts)), replace=False)])
+    queries = sample + rng.normal(scale=0.05, size=sample.shape).astype(np.float32)
+    print(json.dumps(evaluate_index(index, ExactIndex(embeddings), queries, args.k), indent=2))